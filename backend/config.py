@@ -7,11 +7,47 @@ class Settings(BaseSettings):
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     jwt_expire_minutes: int = 60
+    refresh_token_days: int = 30
+    refresh_reuse_grace_seconds: int = 30
     aws_access_key_id: str = ""
     aws_secret_access_key: str = ""
     s3_bucket_name: str = "coinnet-proofs"
     s3_region: str = "us-east-1"
     frontend_url: str = "http://localhost:5173"
+    archive_after_days: int = 180
+    archive_prefix: str = "archive/transactions"
+    presence_ttl_seconds: int = 90
+    presence_flush_seconds: int = 15
+    reservation_ttl_minutes: int = 30
+    web_concurrency: int = 1
+    redis_url: str = ""
+    provider_index_enabled: bool = False
+    provider_index_reconcile_seconds: int = 30
+    auth_cache_seconds: int = 15
+    auth_cache_size: int = 10000
+    auth_revocation_sync_seconds: int = 15
+    vapid_public_key: str = ""
+    vapid_private_key: str = ""
+    vapid_subject: str = "mailto:soporte@coinnet.app"
+    smtp_host: str = ""
+    smtp_port: int = 587
+    smtp_user: str = ""
+    smtp_password: str = ""
+    smtp_from: str = "Coinnet <no-reply@coinnet.app>"
+    notification_coalesce_ms: int = 500
+    notification_workers: int = 4
+    notification_retries: int = 3
+    drift_check_minutes: int = 360
+    risk_flag_score: float = 0.5
+    risk_hold_score: float = 0.8
+    risk_max_requests_per_hour: int = 5
+    risk_amount_spike: float = 3.0
+    mongo_min_pool_size: int = 5
+    health_timeout_seconds: float = 2.0
+    health_cache_seconds: float = 5.0
+    health_check_s3: bool = False
+    shutdown_grace_seconds: int = 20
+    shutdown_drain_seconds: int = 5
 
     class Config:
         env_file = ".env"
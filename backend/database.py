@@ -1,24 +1,108 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from config import get_settings
 
 settings = get_settings()
 
 client: AsyncIOMotorClient = None
 
+# IllegalOperation: transacciones solo en replica set o mongos
+TRANSACTIONS_UNSUPPORTED = {20}
+# IndexOptionsConflict / IndexKeySpecsConflict: ya hay un índice distinto sobre la misma clave
+INDEX_CONFLICT = {85, 86}
+_transactions_supported = True
+
 
 async def connect_db():
     global client
-    client = AsyncIOMotorClient(settings.mongodb_uri)
+    client = AsyncIOMotorClient(settings.mongodb_uri, minPoolSize=settings.mongo_min_pool_size)
     db = client.coinnet
     # Índices geoespaciales
     await db.providers.create_index([("location", "2dsphere")])
+    await db.providers.create_index([("is_available", 1), ("last_seen_at", 1)])
+    # Búsqueda del panel de administración
+    await db.providers.create_index(
+        [("business_name", "text"), ("address", "text")],
+        name="provider_text",
+        default_language="spanish",
+        weights={"business_name": 3, "address": 1},
+    )
+    await db.providers.create_index("sinpe_number")
+    await db.providers.create_index("bank_email")
+    await db.providers.create_index("search_grams")
+    await db.users.create_index("search_grams")
     await db.users.create_index("email", unique=True)
     await db.users.create_index("phone", unique=True, sparse=True)
     await db.transactions.create_index([("user_id", 1), ("status", 1)])
     await db.transactions.create_index([("provider_id", 1), ("status", 1)])
+    await ensure_code_index(db)
+    await db.transactions.create_index([("status", 1), ("updated_at", 1)])
+    await db.transactions.create_index(
+        [("requested_amount", -1), ("_id", 1)],
+        name="dispute_queue",
+        partialFilterExpression={"status": "disputed"},
+    )
+    await db.transactions.create_index(
+        [("risk.flagged_at", -1)],
+        name="risk_held",
+        partialFilterExpression={"risk.held": True},
+    )
+    await db.transaction_events.create_index([("tx_id", 1), ("ts", 1)])
+    await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.revoked_tokens.create_index("created_at")
+    await db.refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.refresh_tokens.create_index("family_id")
+    await db.refresh_tokens.create_index("user_id")
+    await db.archived_transactions.create_index("transaction_code")
+    await db.proof_hashes.create_index("sha256")
+    await db.proof_hashes.create_index([("bands", 1), ("_id", -1)])
+    await db.proof_hashes.create_index("tx_id")
+    await db.push_subscriptions.create_index("endpoint", unique=True)
+    await db.push_subscriptions.create_index("user_id")
     print("✅ Conectado a MongoDB")
 
 
+async def ensure_code_index(db) -> bool:
+    """Índice único de `transaction_code`; con duplicados heredados deja uno normal y avisa.
+
+    `scripts/dedupe_transaction_codes.py` reasigna los duplicados y crea el índice único.
+    El índice de respaldo se borra antes de intentar el único: con la misma clave y otras
+    opciones Mongo rechazaría la creación con IndexOptionsConflict.
+    """
+    indexes = await db.transactions.index_information()
+    if any(info.get("unique") and info["key"] == [("transaction_code", 1)] for info in indexes.values()):
+        return True
+    if "transaction_code_lookup" in indexes:
+        await db.transactions.drop_index("transaction_code_lookup")
+    try:
+        await db.transactions.create_index("transaction_code", unique=True)
+        return True
+    except DuplicateKeyError:
+        print("⚠️ Hay códigos de transacción repetidos; corre scripts/dedupe_transaction_codes.py")
+    except OperationFailure as e:
+        if e.code not in INDEX_CONFLICT:
+            raise
+        print(f"⚠️ Ya existe otro índice sobre transaction_code ({e}); se mantiene sin unicidad")
+        return False
+    await db.transactions.create_index("transaction_code", name="transaction_code_lookup")
+    return False
+
+
+async def warm_pool(connections: int = None):
+    """Abre conexiones del pool antes de recibir tráfico con pings concurrentes.
+
+    Cada ping en paralelo necesita su propia conexión, así las primeras peticiones
+    no pagan el handshake (TLS y autenticación) con el servidor.
+    """
+    connections = connections or settings.mongo_min_pool_size
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(1, connections))))
+
+
+async def ping_db():
+    await client.admin.command("ping")
+
+
 async def close_db():
     global client
     if client:
@@ -27,3 +111,25 @@ async def close_db():
 
 def get_db():
     return client.coinnet
+
+
+def get_client() -> AsyncIOMotorClient:
+    return client
+
+
+async def run_in_transaction(callback):
+    """Ejecuta `callback(session)` en una transacción con los reintentos de `with_transaction`.
+
+    En un servidor standalone (desarrollo) no hay transacciones y se llama con `session=None`.
+    """
+    global _transactions_supported
+    if _transactions_supported:
+        try:
+            async with await client.start_session() as session:
+                return await session.with_transaction(callback)
+        except OperationFailure as e:
+            if e.code not in TRANSACTIONS_UNSUPPORTED:
+                raise
+            _transactions_supported = False
+            print("⚠️ MongoDB sin soporte de transacciones, escrituras sin sesión")
+    return await callback(None)
@@ -1,9 +1,22 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 from config import get_settings
-from database import connect_db, close_db
-from routes import auth, providers, transactions, admin
+from database import connect_db, close_db, warm_pool
+from middleware.lifecycle import lifecycle, InFlightMiddleware
+from routes import auth, providers, transactions, admin, dashboard, notifications as notification_routes
+from services.pending import pending_projection
+from services.presence import presence
+from services.liquidity import reservation_sweeper
+from services.state import shared_state
+from services.provider_index import provider_index
+from services.revocation import revocations
+from services.notifications import notifications
+from services.drift import drift_detector
+from services.risk import risk_engine
+from services.health import health_checker
 
 settings = get_settings()
 
@@ -11,7 +24,32 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_db()
+    await warm_pool()
+    await pending_projection.start()
+    await risk_engine.warm()
+    await shared_state.start()
+    await revocations.start()
+    await presence.start()
+    await reservation_sweeper.start()
+    await provider_index.start()
+    await notifications.start()
+    await drift_detector.start()
+    lifecycle.install_prestop(settings.shutdown_drain_seconds)
+    lifecycle.ready = True
     yield
+    # Un solo presupuesto desde el SIGTERM: espera previa, peticiones en curso (uvicorn) y avisos
+    lifecycle.begin_drain()
+    if lifecycle.in_flight:
+        print(f"⚠️ Apagando con {lifecycle.in_flight} peticiones en curso")
+    await notifications.drain(lifecycle.remaining(settings.shutdown_grace_seconds))
+    await drift_detector.stop()
+    await notifications.stop()
+    await provider_index.stop()
+    await reservation_sweeper.stop()
+    await presence.stop()
+    await revocations.stop()
+    await shared_state.stop()
+    await pending_projection.stop()
     await close_db()
 
 
@@ -35,10 +73,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+app.add_middleware(InFlightMiddleware)
+
 app.include_router(auth.router, prefix="/api/v1")
 app.include_router(providers.router, prefix="/api/v1")
 app.include_router(transactions.router, prefix="/api/v1")
 app.include_router(admin.router, prefix="/api/v1")
+app.include_router(dashboard.router, prefix="/api/v1")
+app.include_router(notification_routes.router, prefix="/api/v1")
 
 
 @app.get("/", tags=["Health"])
@@ -46,6 +89,32 @@ async def root():
     return {"status": "ok", "app": "Coinnet API", "version": "1.0.0"}
 
 
+@app.get("/health/live", tags=["Health"])
+async def live():
+    """El proceso responde; no mira dependencias para que un Mongo caído no provoque reinicios."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["Health"])
+async def ready():
+    """Lista para recibir tráfico: arranque terminado, sin drenar y dependencias accesibles."""
+    if not lifecycle.ready:
+        status = "draining" if lifecycle.draining else "starting"
+        return JSONResponse({"status": status}, status_code=503)
+    checks = await health_checker.dependencies()
+    ok = all(c["ok"] for c in checks.values())
+    return JSONResponse({"status": "ready" if ok else "unavailable", "checks": checks}, status_code=200 if ok else 503)
+
+
 @app.get("/health", tags=["Health"])
 async def health():
-    return {"status": "healthy"}
+    checks = await health_checker.dependencies()
+    ok = all(c["ok"] for c in checks.values())
+    body = {
+        "status": "healthy" if ok else "degraded",
+        "ready": lifecycle.ready,
+        "draining": lifecycle.draining,
+        "in_flight": lifecycle.in_flight,
+        "checks": checks,
+    }
+    return JSONResponse(body, status_code=200 if ok else 503)
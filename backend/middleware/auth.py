@@ -2,18 +2,28 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from bson import ObjectId
 from config import get_settings
 from database import get_db
+from services.revocation import revocations
+from services.state import on_invalidate
+import hashlib
+import time
+import uuid
 
 settings = get_settings()
 bearer_scheme = HTTPBearer()
 
+# Tokens ya verificados: hash del token -> (payload, usuario, vigente_hasta)
+_token_cache = OrderedDict()
+
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=settings.jwt_expire_minutes)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + timedelta(minutes=settings.jwt_expire_minutes)
+    to_encode.update({"exp": expire, "iat": int(now.timestamp()), "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
 
 
@@ -28,23 +38,69 @@ def decode_token(token: str) -> dict:
         )
 
 
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cache_get(key: str):
+    entry = _token_cache.get(key)
+    if not entry:
+        return None
+    if entry[2] <= time.time():
+        _token_cache.pop(key, None)
+        return None
+    _token_cache.move_to_end(key)
+    return entry
+
+
+def _cache_put(key: str, payload: dict, user: dict):
+    # Nunca más allá del vencimiento del token
+    until = min(time.time() + settings.auth_cache_seconds, payload.get("exp", 0))
+    _token_cache[key] = (payload, user, until)
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > settings.auth_cache_size:
+        _token_cache.popitem(last=False)
+
+
+async def evict_user(user_id: str):
+    for key in [k for k, (_, user, _) in _token_cache.items() if user["id"] == user_id]:
+        _token_cache.pop(key, None)
+
+
+async def evict_token(jti: str):
+    for key in [k for k, (payload, _, _) in _token_cache.items() if payload.get("jti") == jti]:
+        _token_cache.pop(key, None)
+
+
+on_invalidate("user", evict_user)
+on_invalidate("token", evict_token)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
 ):
+    key = token_key(credentials.credentials)
+    cached = _cache_get(key)
+    if cached and not revocations.is_revoked(cached[0]):
+        return dict(cached[1])
+
     payload = decode_token(credentials.credentials)
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Token inválido")
+    if revocations.is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Sesión revocada")
 
     db = get_db()
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"password_hash": 0})
     if not user:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
     if user.get("status") == "suspended":
         raise HTTPException(status_code=403, detail="Cuenta suspendida")
 
     user["id"] = str(user["_id"])
-    return user
+    _cache_put(key, payload, user)
+    return dict(user)
 
 
 async def require_provider(current_user=Depends(get_current_user)):
@@ -0,0 +1,20 @@
+import hashlib
+from fastapi import Request, Response
+
+# Respuestas por usuario: el navegador puede guardarlas pero debe revalidar siempre
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    raw = ":".join(str(p) for p in parts)
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+
+def not_modified(request: Request, response: Response, etag: str):
+    """Devuelve un 304 si el cliente ya tiene esta versión; si no, marca la respuesta con el ETag."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    header = request.headers.get("if-none-match")
+    if header and (header.strip() == "*" or etag in [t.strip() for t in header.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
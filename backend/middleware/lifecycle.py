@@ -0,0 +1,83 @@
+import asyncio
+import signal
+import time
+
+
+class Lifecycle:
+    """Estado del proceso para las sondas y el apagado: listo, drenando y peticiones en curso."""
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.in_flight = 0
+        self._drain_started = None
+
+    def begin_drain(self):
+        if not self.draining:
+            self.ready = False
+            self.draining = True
+            self._drain_started = time.monotonic()
+
+    def remaining(self, budget: float) -> float:
+        """Lo que queda de `budget` segundos contados desde que empezó el drenado."""
+        if self._drain_started is None:
+            return budget
+        return max(0.0, budget - (time.monotonic() - self._drain_started))
+
+    def install_prestop(self, delay: float):
+        """Adelanta el drenado al SIGTERM, antes de que uvicorn cierre el socket.
+
+        uvicorn deja de aceptar conexiones apenas recibe la señal; aquí se marca el proceso
+        como no listo y se le pasa la señal `delay` segundos después, para que el balanceador
+        vea /health/ready en 503 y deje de enviar tráfico mientras todavía se atiende.
+        Un segundo SIGTERM se pasa de inmediato.
+        """
+        try:
+            previous = signal.getsignal(signal.SIGTERM)
+        except ValueError:
+            return
+        if not callable(previous) or delay <= 0:
+            return
+        loop = asyncio.get_running_loop()
+
+        def handler(sig, frame):
+            if self.draining:
+                return previous(sig, frame)
+            self.begin_drain()
+            loop.call_soon_threadsafe(loop.call_later, delay, previous, sig, frame)
+
+        try:
+            signal.signal(signal.SIGTERM, handler)
+        except ValueError:
+            # Fuera del hilo principal (p. ej. bajo un runner de pruebas) no se pueden instalar señales
+            pass
+
+
+lifecycle = Lifecycle()
+
+
+class InFlightMiddleware:
+    """Middleware ASGI puro: no envuelve el cuerpo de la respuesta, así que no afecta las subidas.
+
+    Mientras drena, las respuestas cierran la conexión para que el cliente reconecte
+    (y el balanceador lo mande a otra réplica) en vez de reusar un keep-alive a este proceso.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and lifecycle.draining:
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"connection"]
+                message = {**message, "headers": headers + [(b"connection", b"close")]}
+            await send(message)
+
+        lifecycle.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            lifecycle.in_flight -= 1
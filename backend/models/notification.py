@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+
+class PushSubscriptionKeys(BaseModel):
+    p256dh: str
+    auth: str
+
+
+class PushSubscriptionCreate(BaseModel):
+    endpoint: str = Field(min_length=10)
+    keys: PushSubscriptionKeys
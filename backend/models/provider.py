@@ -53,6 +53,7 @@ class ProviderOut(BaseModel):
     verification_status: str
     is_available: bool
     declared_liquidity: Optional[float]
+    available_liquidity: Optional[float] = None
     min_amount: float
     max_amount: float
     reputation_score: float
@@ -73,12 +74,15 @@ class ProviderInDB(BaseModel):
     verification_status: str = "pending_review"
     is_available: bool = False
     declared_liquidity: Optional[float] = None
+    reserved_liquidity: float = 0.0
+    available_liquidity: Optional[float] = None
     min_amount: float = 1000
     max_amount: float = 100000
-    reputation_score: float = 5.0
-    total_transactions: int = 0
-    total_volume: float = 0.0
-    dispute_rate: float = 0.0
+    # Ausentes hasta su primer cambio; al leer valen 5.0 y 0
+    reputation_score: Optional[float] = None
+    total_transactions: Optional[int] = None
+    total_volume: Optional[float] = None
+    dispute_rate: Optional[float] = None
     cover_photo: Optional[str] = None
     logo: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
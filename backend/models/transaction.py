@@ -1,9 +1,37 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
 
 COMMISSION_RATE = 0.05
 
+# v2: sin nulos ni valores por defecto y nombres cortos en campos que no se consultan
+SCHEMA_VERSION = 2
+STORED_NAMES = {
+    "commission_rate": "cr",
+    "total_to_send": "tts",
+    "sinpe_sent_at": "t_ss",
+    "proof_uploaded_at": "t_pu",
+    "verified_at": "t_vf",
+    "completed_at": "t_cp",
+    "cancelled_at": "t_cx",
+}
+LOGICAL_NAMES = {stored: logical for logical, stored in STORED_NAMES.items()}
+# Destino del pago al momento de la solicitud: se guarda en la transacción porque el
+# proveedor puede cambiar su SINPE después y el usuario debe ver a dónde envió
+PROVIDER_COPIES = {"provider_name": "business_name", "sinpe_number": "sinpe_number", "sinpe_holder_name": "sinpe_holder_name"}
+
+# Máquina de estados: a qué estados puede pasar cada uno
+STATUS_TRANSITIONS = {
+    "requested": ["accepted", "cancelled", "disputed"],
+    "accepted": ["sinpe_sent", "proof_uploaded", "cancelled", "disputed"],
+    "sinpe_sent": ["proof_uploaded", "cancelled", "disputed"],
+    "proof_uploaded": ["verified", "cancelled", "disputed"],
+    "verified": ["completed", "cancelled", "disputed"],
+    "disputed": ["completed", "cancelled"],
+    "completed": [],
+    "cancelled": [],
+}
+
 
 class TransactionCreate(BaseModel):
     provider_id: str
@@ -28,6 +56,9 @@ class TransactionOut(BaseModel):
 
 
 class TransactionInDB(BaseModel):
+    """Campos lógicos; en Mongo se guardan con `to_storage` (los opcionales solo si tienen valor
+    y la comisión solo si difiere de COMMISSION_RATE)."""
+    v: int = SCHEMA_VERSION
     transaction_code: str
     user_id: str
     provider_id: str
@@ -35,6 +66,9 @@ class TransactionInDB(BaseModel):
     requested_amount: float
     commission_rate: float = COMMISSION_RATE
     commission_amount: float
+    provider_name: Optional[str] = None
+    sinpe_number: Optional[str] = None
+    sinpe_holder_name: Optional[str] = None
     total_to_send: float
     proof_s3_url: Optional[str] = None
     proof_uploaded_at: Optional[datetime] = None
@@ -42,16 +76,50 @@ class TransactionInDB(BaseModel):
     verified_at: Optional[datetime] = None
     completed_at: Optional[datetime] = None
     cancelled_at: Optional[datetime] = None
-    timeline: List[dict] = []
     dispute: Optional[dict] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+def to_storage(fields: dict) -> dict:
+    """Campos lógicos a documento (o `$set`) almacenado: nombres cortos, sin nulos ni la comisión por defecto."""
+    return {
+        STORED_NAMES.get(k, k): v for k, v in fields.items()
+        if v is not None and not (k == "commission_rate" and v == COMMISSION_RATE)
+    }
+
+
+def from_storage(doc: dict) -> dict:
+    """Documento v1 o v2 a campos lógicos; devuelve una copia."""
+    doc = dict(doc)
+    for stored, logical in LOGICAL_NAMES.items():
+        if stored in doc:
+            doc[logical] = doc.pop(stored)
+    doc.setdefault("commission_rate", COMMISSION_RATE)
+    return doc
+
+
 class DisputeCreate(BaseModel):
     reason: str = Field(min_length=10)
 
 
+class DisputeResolution(BaseModel):
+    final_status: str = "cancelled"
+    resolution: str = "Resuelto por administrador"
+    notes: str = ""
+
+    @field_validator("final_status")
+    @classmethod
+    def check_transition(cls, v):
+        if v not in STATUS_TRANSITIONS["disputed"]:
+            raise ValueError(f"Una disputa solo puede resolverse como: {', '.join(STATUS_TRANSITIONS['disputed'])}")
+        return v
+
+
+class DisputeBulkResolution(DisputeResolution):
+    tx_ids: List[str] = Field(min_length=1, max_length=1000)
+
+
 def calculate_commission(amount: float) -> dict:
     commission = round(amount * COMMISSION_RATE, 2)
     total = round(amount + commission, 2)
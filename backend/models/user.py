@@ -16,6 +16,10 @@ class UserLogin(BaseModel):
     password: str
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class UserOut(BaseModel):
     id: str
     email: str
@@ -34,8 +38,9 @@ class UserInDB(BaseModel):
     account_type: str = "user"
     status: str = "active"
     password_hash: str
-    reputation_score: float = 5.0
-    total_transactions: int = 0
-    disputed_transactions: int = 0
+    # Ausentes hasta su primer cambio; al leer valen 5.0 y 0
+    reputation_score: Optional[float] = None
+    total_transactions: Optional[int] = None
+    disputed_transactions: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
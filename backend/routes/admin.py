@@ -1,12 +1,52 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from datetime import datetime
 from bson import ObjectId
+from bson.errors import InvalidId
 from database import get_db
 from middleware.auth import require_admin
+from models.transaction import DisputeResolution, DisputeBulkResolution
+from services.events import stream_events
+from services.disputes import dispute_queue, resolve_disputes
+from services.state import invalidate
+from services.revocation import revocations
+from services.sessions import revoke_user_sessions
+from services.archive import archived_totals
+from services.notifications import notifications
+from services.search import search
+from services.risk import is_held
 
 router = APIRouter(prefix="/admin", tags=["Administración"])
 
 
+def format_admin_provider(p: dict) -> dict:
+    return {
+        "id": str(p["_id"]),
+        "user_id": p["user_id"],
+        "business_name": p["business_name"],
+        "sinpe_number": p["sinpe_number"],
+        "sinpe_holder_name": p["sinpe_holder_name"],
+        "bank_email": p.get("bank_email"),
+        "verification_status": p["verification_status"],
+        "is_available": p.get("is_available", False),
+        "reputation_score": p.get("reputation_score", 5.0),
+        "total_transactions": p.get("total_transactions", 0),
+        "created_at": p["created_at"],
+    }
+
+
+def format_admin_user(u: dict) -> dict:
+    return {
+        "id": str(u["_id"]),
+        "email": u["email"],
+        "full_name": u["full_name"],
+        "account_type": u["account_type"],
+        "status": u["status"],
+        "reputation_score": u.get("reputation_score", 5.0),
+        "total_transactions": u.get("total_transactions", 0),
+        "created_at": u["created_at"],
+    }
+
+
 @router.get("/metrics", summary="Métricas globales")
 async def get_metrics(admin=Depends(require_admin)):
     db = get_db()
@@ -28,6 +68,13 @@ async def get_metrics(admin=Depends(require_admin)):
     vol_result = await db.transactions.aggregate(pipeline).to_list(1)
     volume_data = vol_result[0] if vol_result else {"total_volume": 0, "total_commission": 0}
 
+    # Sumar lo ya archivado para que los totales no cambien al mover datos a S3
+    archived = await archived_totals()
+    total_transactions += int(archived.get("total", 0))
+    completed_transactions += int(archived.get("completed", 0))
+    volume_data["total_volume"] = volume_data.get("total_volume", 0) + archived.get("completed_volume", 0)
+    volume_data["total_commission"] = volume_data.get("total_commission", 0) + archived.get("completed_commission", 0)
+
     dispute_rate = (disputed_transactions / total_transactions * 100) if total_transactions > 0 else 0
 
     return {
@@ -65,20 +112,7 @@ async def list_providers(
 
     cursor = db.providers.find(query).skip(skip).limit(limit).sort("created_at", -1)
     providers = await cursor.to_list(length=limit)
-
-    return [{
-        "id": str(p["_id"]),
-        "user_id": p["user_id"],
-        "business_name": p["business_name"],
-        "sinpe_number": p["sinpe_number"],
-        "sinpe_holder_name": p["sinpe_holder_name"],
-        "bank_email": p.get("bank_email"),
-        "verification_status": p["verification_status"],
-        "is_available": p.get("is_available", False),
-        "reputation_score": p.get("reputation_score", 5.0),
-        "total_transactions": p.get("total_transactions", 0),
-        "created_at": p["created_at"],
-    } for p in providers]
+    return [format_admin_provider(p) for p in providers]
 
 
 @router.patch("/providers/{provider_id}/verify", summary="Verificar proveedor")
@@ -90,6 +124,7 @@ async def verify_provider(provider_id: str, admin=Depends(require_admin)):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
+    await invalidate("provider", provider_id)
     return {"verification_status": "active", "message": "Proveedor verificado"}
 
 
@@ -102,6 +137,7 @@ async def suspend_provider(provider_id: str, admin=Depends(require_admin)):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
+    await invalidate("provider", provider_id)
     return {"verification_status": "suspended"}
 
 
@@ -119,16 +155,30 @@ async def list_users(
 
     cursor = db.users.find(query, {"password_hash": 0}).skip(skip).limit(limit).sort("created_at", -1)
     users = await cursor.to_list(length=limit)
-    return [{
-        "id": str(u["_id"]),
-        "email": u["email"],
-        "full_name": u["full_name"],
-        "account_type": u["account_type"],
-        "status": u["status"],
-        "reputation_score": u.get("reputation_score", 5.0),
-        "total_transactions": u.get("total_transactions", 0),
-        "created_at": u["created_at"],
-    } for u in users]
+    return [format_admin_user(u) for u in users]
+
+
+@router.get("/search", summary="Buscar proveedores o usuarios")
+async def search_records(
+    q: str = Query(..., min_length=2),
+    scope: str = Query(default="providers", pattern="^(providers|users)$"),
+    limit: int = Query(default=20, le=100),
+    cursor: str = Query(default=None),
+    admin=Depends(require_admin)
+):
+    # Números: prefijo de SINPE o teléfono; con @: prefijo de correo; el resto, por nombre con tolerancia a errores
+    try:
+        result = await search(scope, q, limit, cursor)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    fmt = format_admin_provider if scope == "providers" else format_admin_user
+    results = []
+    for doc in result["docs"]:
+        item = fmt(doc)
+        if "score" in doc:
+            item["score"] = doc["score"]
+        results.append(item)
+    return {"mode": result["mode"], "results": results, "next_cursor": result["next_cursor"]}
 
 
 @router.patch("/users/{user_id}/suspend", summary="Suspender usuario")
@@ -140,40 +190,103 @@ async def suspend_user(user_id: str, admin=Depends(require_admin)):
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    # Corta de inmediato las sesiones abiertas, también las que están en caché en otros workers
+    await revocations.revoke_user(user_id)
+    await revoke_user_sessions(user_id)
     return {"status": "suspended"}
 
 
-@router.get("/disputes", summary="Ver disputas abiertas")
-async def list_disputes(admin=Depends(require_admin)):
+@router.get("/disputes", summary="Cola de disputas abiertas")
+async def list_disputes(
+    limit: int = Query(default=50, le=500),
+    cursor: str = Query(default=None),
+    min_amount: float = Query(default=None),
+    provider_id: str = Query(default=None),
+    user_id: str = Query(default=None),
+    admin=Depends(require_admin)
+):
+    try:
+        return await dispute_queue(limit, cursor, min_amount, provider_id, user_id)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+@router.patch("/disputes/{tx_id}/resolve", summary="Resolver disputa")
+async def resolve_dispute(tx_id: str, resolution: DisputeResolution, admin=Depends(require_admin)):
     db = get_db()
-    cursor = db.transactions.find({"status": "disputed"}).sort("updated_at", -1)
-    txs = await cursor.to_list(length=100)
+    tx = await db.transactions.find_one({"_id": ObjectId(tx_id)}, {"status": 1})
+    if not tx:
+        raise HTTPException(status_code=404, detail="Transacción no encontrada")
+    if tx["status"] != "disputed":
+        raise HTTPException(status_code=400, detail=f"Estado actual: {tx['status']}")
+
+    resolved = await resolve_disputes([tx_id], resolution, admin["id"])
+    if not resolved:
+        raise HTTPException(status_code=409, detail="La disputa ya fue resuelta")
+    return {"status": resolution.final_status, "dispute": resolved[0]["dispute"]}
+
+
+@router.post("/disputes/resolve", summary="Resolver disputas en lote")
+async def resolve_disputes_bulk(data: DisputeBulkResolution, admin=Depends(require_admin)):
+    try:
+        resolved = await resolve_disputes(data.tx_ids, data, admin["id"])
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="ID inválido")
+    resolved_ids = {str(tx["_id"]) for tx in resolved}
+    return {
+        "status": data.final_status,
+        "resolved": sorted(resolved_ids),
+        "skipped": [i for i in data.tx_ids if i not in resolved_ids],
+    }
+
+
+@router.get("/events", summary="Log de eventos de transacciones")
+async def list_events(
+    after: str = Query(default=None),
+    limit: int = Query(default=500, le=5000),
+    admin=Depends(require_admin)
+):
+    try:
+        events = await stream_events(after, limit)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return {"events": events, "next": events[-1]["id"] if events else after}
+
+
+@router.get("/notifications", summary="Entregas y latencia de notificaciones")
+async def notification_stats(admin=Depends(require_admin)):
+    return notifications.stats()
+
+
+@router.get("/risk/held", summary="Transacciones retenidas por riesgo")
+async def list_held(limit: int = Query(default=50, le=200), admin=Depends(require_admin)):
+    db = get_db()
+    cursor = db.transactions.find({"risk.held": True}).sort("risk.flagged_at", -1).limit(limit)
     return [{
         "id": str(tx["_id"]),
         "transaction_code": tx["transaction_code"],
         "user_id": tx["user_id"],
         "provider_id": tx["provider_id"],
+        "status": tx["status"],
         "requested_amount": tx["requested_amount"],
-        "dispute": tx.get("dispute"),
+        "risk": tx["risk"],
         "created_at": tx["created_at"],
-    } for tx in txs]
+    } for tx in await cursor.to_list(length=limit)]
 
 
-@router.patch("/disputes/{tx_id}/resolve", summary="Resolver disputa")
-async def resolve_dispute(tx_id: str, resolution: dict, admin=Depends(require_admin)):
+@router.patch("/transactions/{tx_id}/release", summary="Liberar transacción retenida")
+async def release_hold(tx_id: str, admin=Depends(require_admin)):
     db = get_db()
-    tx = await db.transactions.find_one({"_id": ObjectId(tx_id)})
+    try:
+        tx = await db.transactions.find_one({"_id": ObjectId(tx_id)}, {"risk": 1})
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="ID inválido")
     if not tx:
         raise HTTPException(status_code=404, detail="Transacción no encontrada")
-
-    dispute = tx.get("dispute", {})
-    dispute["resolved_at"] = datetime.utcnow().isoformat()
-    dispute["resolution"] = resolution.get("resolution", "Resuelto por administrador")
-    dispute["admin_notes"] = resolution.get("notes", "")
-
-    final_status = resolution.get("final_status", "cancelled")
+    if not is_held(tx):
+        raise HTTPException(status_code=400, detail="La transacción no está retenida")
     await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {"status": final_status, "dispute": dispute, "updated_at": datetime.utcnow()}}
+        {"_id": tx["_id"]},
+        {"$set": {"risk.held": False, "risk.released_at": datetime.utcnow(), "risk.released_by": admin["id"]}}
     )
-    return {"status": final_status, "dispute": dispute}
+    return {"released": True}
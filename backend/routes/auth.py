@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.security import HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from datetime import datetime
 from bson import ObjectId
 from database import get_db
-from models.user import UserCreate, UserLogin, UserOut
-from middleware.auth import create_access_token, get_current_user
+from models.user import UserCreate, UserLogin, UserOut, RefreshRequest
+from middleware.auth import create_access_token, get_current_user, decode_token, bearer_scheme
+from middleware.http_cache import make_etag, not_modified
+from services.revocation import revocations
+from services.search import search_grams
+from services.sessions import issue_refresh_token, rotate_refresh_token, revoke_family, revoke_user_sessions
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -18,6 +24,20 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+def format_user(user: dict) -> dict:
+    return {
+        "id": user["id"],
+        "email": user["email"],
+        "full_name": user["full_name"],
+        "phone": user.get("phone"),
+        "account_type": user["account_type"],
+        "status": user["status"],
+        "reputation_score": user.get("reputation_score", 5.0),
+        "total_transactions": user.get("total_transactions", 0),
+        "created_at": user["created_at"],
+    }
+
+
 @router.post("/register", summary="Registrar usuario")
 async def register(data: UserCreate):
     db = get_db()
@@ -33,12 +53,10 @@ async def register(data: UserCreate):
         "account_type": data.account_type,
         "status": "active",
         "password_hash": hash_password(data.password),
-        "reputation_score": 5.0,
-        "total_transactions": 0,
-        "disputed_transactions": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
     }
+    user_doc["search_grams"] = search_grams(user_doc, "users")
 
     result = await db.users.insert_one(user_doc)
     user_id = str(result.inserted_id)
@@ -46,6 +64,7 @@ async def register(data: UserCreate):
 
     return {
         "access_token": token,
+        "refresh_token": await issue_refresh_token(user_id),
         "token_type": "bearer",
         "user": {
             "id": user_id,
@@ -79,6 +98,7 @@ async def login(data: UserLogin):
 
     return {
         "access_token": token,
+        "refresh_token": await issue_refresh_token(user_id),
         "token_type": "bearer",
         "user": {
             "id": user_id,
@@ -91,16 +111,58 @@ async def login(data: UserLogin):
     }
 
 
+async def own_provider_id(user: dict):
+    if user["account_type"] != "provider_business":
+        return None
+    provider = await get_db().providers.find_one({"user_id": user["id"]}, {"_id": 1})
+    return str(provider["_id"]) if provider else None
+
+
 @router.get("/me", summary="Perfil propio")
-async def get_me(current_user=Depends(get_current_user)):
+async def get_me(request: Request, response: Response, current_user=Depends(get_current_user)):
+    # El usuario del caché de tokens puede ir atrasado (total_transactions, estado): el perfil
+    # y su ETag salen de una lectura fresca. El perfil de proveedor puede crearse después del
+    # registro: lo necesita el latido de presencia
+    user, provider_id = await asyncio.gather(
+        get_db().users.find_one({"_id": ObjectId(current_user["id"])}, {"password_hash": 0}),
+        own_provider_id(current_user),
+    )
+    if not user:
+        raise HTTPException(status_code=401, detail="Usuario no encontrado")
+    user["id"] = current_user["id"]
+    cached = not_modified(request, response, make_etag(
+        "user", user["id"], user["updated_at"].isoformat(), provider_id
+    ))
+    if cached:
+        return cached
+    return {**format_user(user), "provider_id": provider_id}
+
+
+@router.post("/refresh", summary="Renovar sesión")
+async def refresh(data: RefreshRequest):
+    db = get_db()
+    # Sin bcrypt: el refresh token ya prueba la sesión
+    user_id, _, refresh_token = await rotate_refresh_token(data.refresh_token)
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"account_type": 1, "status": 1})
+    if not user or user.get("status") == "suspended":
+        await revoke_user_sessions(user_id)
+        raise HTTPException(status_code=403, detail="Cuenta suspendida")
+
     return {
-        "id": current_user["id"],
-        "email": current_user["email"],
-        "full_name": current_user["full_name"],
-        "phone": current_user.get("phone"),
-        "account_type": current_user["account_type"],
-        "status": current_user["status"],
-        "reputation_score": current_user.get("reputation_score", 5.0),
-        "total_transactions": current_user.get("total_transactions", 0),
-        "created_at": current_user["created_at"],
+        "access_token": create_access_token({"sub": user_id, "account_type": user["account_type"]}),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
     }
+
+
+@router.post("/logout", summary="Cerrar sesión")
+async def logout(
+    data: RefreshRequest = None,
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+):
+    payload = decode_token(credentials.credentials)
+    if payload.get("jti"):
+        await revocations.revoke_token(payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+    if data:
+        await revoke_family(data.refresh_token)
+    return {"message": "Sesión cerrada"}
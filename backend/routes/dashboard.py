@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+from database import get_db
+from middleware.auth import get_current_user
+from routes.auth import format_user
+from routes.providers import format_provider
+from routes.transactions import user_transactions, provider_pending
+
+router = APIRouter(prefix="/dashboard", tags=["Panel"])
+
+
+@router.get("", summary="Datos del panel en una sola llamada")
+async def get_dashboard(current_user=Depends(get_current_user)):
+    # Cada tipo de cuenta trae solo lo que su panel muestra: el negocio sus pendientes,
+    # el usuario su historial
+    provider, transactions, pending = None, [], []
+    if current_user["account_type"] == "provider_business":
+        provider = await get_db().providers.find_one({"user_id": current_user["id"]})
+        if provider:
+            pending = await provider_pending(str(provider["_id"]))
+    else:
+        transactions = await user_transactions(current_user["id"])
+    return {
+        "me": format_user(current_user),
+        "provider": format_provider(provider) if provider else None,
+        "transactions": transactions,
+        "pending": pending,
+    }
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+from config import get_settings
+from database import get_db
+from models.notification import PushSubscriptionCreate
+from middleware.auth import get_current_user
+
+router = APIRouter(prefix="/notifications", tags=["Notificaciones"])
+settings = get_settings()
+
+
+@router.get("/vapid-key", summary="Clave pública para suscribirse a Web Push")
+async def get_vapid_key():
+    return {"public_key": settings.vapid_public_key or None}
+
+
+@router.post("/subscriptions", summary="Registrar suscripción Web Push")
+async def subscribe(data: PushSubscriptionCreate, current_user=Depends(get_current_user)):
+    db = get_db()
+    now = datetime.utcnow()
+    # Un endpoint pertenece a un navegador; si cambia de cuenta pasa al usuario actual
+    await db.push_subscriptions.update_one(
+        {"endpoint": data.endpoint},
+        {
+            "$set": {"user_id": current_user["id"], "keys": data.keys.model_dump(), "updated_at": now},
+            "$setOnInsert": {"created_at": now},
+        },
+        upsert=True,
+    )
+    return {"ok": True}
+
+
+@router.delete("/subscriptions", summary="Eliminar suscripción Web Push")
+async def unsubscribe(endpoint: str = Query(...), current_user=Depends(get_current_user)):
+    db = get_db()
+    await db.push_subscriptions.delete_one({"endpoint": endpoint, "user_id": current_user["id"]})
+    return {"ok": True}
@@ -1,21 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from datetime import datetime
 from bson import ObjectId
+from config import get_settings
 from database import get_db
 from models.provider import ProviderCreate, ProviderUpdate, ProviderAvailability, ProviderInDB, LocationModel
 from middleware.auth import get_current_user, require_provider
-import math
+from middleware.http_cache import make_etag, not_modified
+from services.presence import presence
+from services.liquidity import refresh_available
+from services.geo import haversine
+from services.provider_index import provider_index
+from services.state import invalidate
+from services.search import search_grams
 
 router = APIRouter(prefix="/providers", tags=["Proveedores"])
-
-
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+settings = get_settings()
 
 
 def format_provider(p: dict, lat: float = None, lng: float = None) -> dict:
@@ -36,6 +35,7 @@ def format_provider(p: dict, lat: float = None, lng: float = None) -> dict:
         "verification_status": p.get("verification_status", "pending_review"),
         "is_available": p.get("is_available", False),
         "declared_liquidity": p.get("declared_liquidity"),
+        "available_liquidity": p.get("available_liquidity", p.get("declared_liquidity")),
         "min_amount": p.get("min_amount", 1000),
         "max_amount": p.get("max_amount", 100000),
         "reputation_score": p.get("reputation_score", 5.0),
@@ -76,18 +76,15 @@ async def create_provider(data: ProviderCreate, current_user=Depends(get_current
         "description": data.description,
         "verification_status": "pending_review",
         "is_available": False,
-        "declared_liquidity": None,
         "min_amount": data.min_amount,
         "max_amount": data.max_amount,
-        "reputation_score": 5.0,
-        "total_transactions": 0,
-        "total_volume": 0.0,
-        "dispute_rate": 0.0,
-        "cover_photo": None,
-        "logo": None,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
     }
+    # Opcionales vacíos no se guardan; format_provider y las consultas ya tratan ausente como nulo.
+    # Reputación y contadores tampoco: se leen con su valor inicial y $inc crea el campo
+    doc = {k: v for k, v in doc.items() if v is not None}
+    doc["search_grams"] = search_grams(doc, "providers")
 
     result = await db.providers.insert_one(doc)
     doc["_id"] = result.inserted_id
@@ -104,6 +101,15 @@ async def get_nearby_providers(
 ):
     db = get_db()
 
+    if settings.provider_index_enabled and provider_index.ready:
+        matches = provider_index.search(lat, lng, amount, radius_km, datetime.utcnow() - presence.ttl)
+        result = [format_provider(p, lat, lng) for p, _ in matches]
+        result.sort(key=lambda x: (
+            0 if x["verification_status"] == "active" else 1,
+            x["distance_km"] or 999
+        ))
+        return {"providers": result, "total": len(result)}
+
     query = {
         "location": {
             "$near": {
@@ -113,11 +119,14 @@ async def get_nearby_providers(
         },
         "is_available": True,
         "verification_status": {"$in": ["active", "pending_review"]},
+        **presence.freshness_filter(),
     }
 
     if amount > 0:
         query["min_amount"] = {"$lte": amount}
         query["max_amount"] = {"$gte": amount}
+        # available_liquidity nulo o ausente significa sin límite declarado
+        query["$or"] = [{"available_liquidity": None}, {"available_liquidity": {"$gte": amount}}]
 
     cursor = db.providers.find(query).limit(20)
     providers = await cursor.to_list(length=20)
@@ -132,23 +141,31 @@ async def get_nearby_providers(
 
 
 @router.get("/my", summary="Mi perfil de proveedor")
-async def get_my_provider(current_user=Depends(get_current_user)):
+async def get_my_provider(request: Request, response: Response, current_user=Depends(get_current_user)):
     db = get_db()
-    provider = await db.providers.find_one({"user_id": current_user["id"]})
-    if not provider:
+    head = await db.providers.find_one({"user_id": current_user["id"]}, {"updated_at": 1})
+    if not head:
         raise HTTPException(status_code=404, detail="No tienes perfil de proveedor")
+    cached = not_modified(request, response, make_etag("provider", head["_id"], head["updated_at"].isoformat()))
+    if cached:
+        return cached
+    provider = await db.providers.find_one({"_id": head["_id"]})
     return format_provider(provider)
 
 
 @router.get("/{provider_id}", summary="Ver perfil de proveedor")
-async def get_provider(provider_id: str, current_user=Depends(get_current_user)):
+async def get_provider(provider_id: str, request: Request, response: Response, current_user=Depends(get_current_user)):
     db = get_db()
     try:
-        provider = await db.providers.find_one({"_id": ObjectId(provider_id)})
+        head = await db.providers.find_one({"_id": ObjectId(provider_id)}, {"updated_at": 1})
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido")
-    if not provider:
+    if not head:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
+    cached = not_modified(request, response, make_etag("provider", provider_id, head["updated_at"].isoformat()))
+    if cached:
+        return cached
+    provider = await db.providers.find_one({"_id": head["_id"]})
     return format_provider(provider)
 
 
@@ -169,8 +186,13 @@ async def update_provider(provider_id: str, data: ProviderUpdate, current_user=D
     elif "longitude" in update:
         update.pop("longitude")
 
+    if any(field in update for field in ("business_name", "address", "sinpe_holder_name")):
+        update["search_grams"] = search_grams({**provider, **update}, "providers")
     update["updated_at"] = datetime.utcnow()
     await db.providers.update_one({"_id": ObjectId(provider_id)}, {"$set": update})
+    if "declared_liquidity" in update:
+        await refresh_available(provider_id)
+    await invalidate("provider", provider_id)
     updated = await db.providers.find_one({"_id": ObjectId(provider_id)})
     return format_provider(updated)
 
@@ -184,12 +206,38 @@ async def set_availability(provider_id: str, data: ProviderAvailability, current
     if provider["user_id"] != current_user["id"] and current_user["account_type"] != "superadmin":
         raise HTTPException(status_code=403, detail="Sin permisos")
 
-    await db.providers.update_one(
-        {"_id": ObjectId(provider_id)},
-        {"$set": {
-            "is_available": data.is_available,
-            "declared_liquidity": data.declared_liquidity,
-            "updated_at": datetime.utcnow()
-        }}
-    )
+    now = datetime.utcnow()
+    update = {
+        "is_available": data.is_available,
+        "declared_liquidity": data.declared_liquidity,
+        "updated_at": now,
+    }
+    if data.is_available:
+        update["last_seen_at"] = now
+        presence.beat(provider_id, now)
+    await db.providers.update_one({"_id": ObjectId(provider_id)}, {"$set": update})
+    await refresh_available(provider_id)
+    await invalidate("provider", provider_id)
     return {"is_available": data.is_available, "declared_liquidity": data.declared_liquidity}
+
+
+@router.post("/{provider_id}/heartbeat", summary="Latido de presencia del proveedor")
+async def heartbeat(provider_id: str, current_user=Depends(get_current_user)):
+    owner = presence.owner(provider_id)
+    if owner is None:
+        db = get_db()
+        try:
+            provider = await db.providers.find_one({"_id": ObjectId(provider_id)}, {"user_id": 1})
+        except Exception:
+            raise HTTPException(status_code=400, detail="ID inválido")
+        if not provider:
+            raise HTTPException(status_code=404, detail="Proveedor no encontrado")
+        owner = provider["user_id"]
+        presence.remember_owner(provider_id, owner)
+    if owner != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Sin permisos")
+
+    now = datetime.utcnow()
+    presence.beat(provider_id, now)
+    provider_index.touch(provider_id, now)
+    return {"ok": True, "ttl_seconds": settings.presence_ttl_seconds}
@@ -1,24 +1,39 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Request, Response
 from datetime import datetime
 from bson import ObjectId
-from database import get_db
-from models.transaction import TransactionCreate, TransactionInDB, DisputeCreate, calculate_commission
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import get_db, run_in_transaction
+from models.transaction import (
+    TransactionCreate, DisputeCreate, calculate_commission,
+    SCHEMA_VERSION, PROVIDER_COPIES, to_storage, from_storage,
+)
 from middleware.auth import get_current_user
+from middleware.http_cache import make_etag, not_modified
 from services.s3 import upload_proof
-import random
-import string
+from services.codes import generate_code
+from services.events import record_event, list_events, format_event, merge_timeline
+from services.archive import find_archived
+from services.pending import pending_projection, ACTIVE_STATUSES
+from services.presence import presence
+from services.notifications import notifications
+from services.risk import risk_engine, is_held
+from services.proofs import fingerprint, register_proof
+from services import liquidity
+from services.state import invalidate
 
 router = APIRouter(prefix="/transactions", tags=["Transacciones"])
 
 VALID_STATUSES = ["requested", "accepted", "sinpe_sent", "proof_uploaded", "verified", "completed", "cancelled", "disputed"]
 
 
-def generate_code():
-    suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-    return f"CN-{datetime.utcnow().strftime('%Y%m')}-{suffix}"
+# Lo que se muestra del proveedor en transacciones v2 creadas sin su copia SINPE
+PROVIDER_FIELDS = {"business_name": 1, "sinpe_number": 1, "sinpe_holder_name": 1, "updated_at": 1}
 
 
-def format_tx(tx: dict, include_sinpe: bool = False) -> dict:
+def format_tx(tx: dict, include_sinpe: bool = False, provider: dict = None) -> dict:
+    tx = from_storage(tx)
     result = {
         "id": str(tx["_id"]),
         "transaction_code": tx["transaction_code"],
@@ -29,22 +44,82 @@ def format_tx(tx: dict, include_sinpe: bool = False) -> dict:
         "commission_amount": tx["commission_amount"],
         "total_to_send": tx["total_to_send"],
         "proof_url": tx.get("proof_s3_url"),
-        "timeline": tx.get("timeline", []),
         "dispute": tx.get("dispute"),
         "created_at": tx["created_at"],
         "updated_at": tx["updated_at"],
     }
     if include_sinpe:
-        result["sinpe_number"] = tx.get("sinpe_number")
-        result["sinpe_holder_name"] = tx.get("sinpe_holder_name")
-        result["provider_name"] = tx.get("provider_name")
+        # Manda la copia guardada al solicitar; el proveedor solo completa las que no la tienen
+        for field, provider_field in PROVIDER_COPIES.items():
+            result[field] = tx[field] if field in tx else (provider or {}).get(provider_field)
     return result
 
 
-def add_timeline_event(tx: dict, status: str, actor: str, notes: str = "") -> list:
-    events = tx.get("timeline", [])
-    events.append({"status": status, "timestamp": datetime.utcnow().isoformat(), "actor": actor, "notes": notes})
-    return events
+async def providers_by_id(provider_ids) -> dict:
+    ids = [ObjectId(i) for i in set(provider_ids) if ObjectId.is_valid(i)]
+    if not ids:
+        return {}
+    docs = await get_db().providers.find({"_id": {"$in": ids}}, PROVIDER_FIELDS).to_list(length=len(ids))
+    return {str(p["_id"]): p for p in docs}
+
+
+async def format_txs(txs: list) -> list:
+    """Formatea con datos SINPE; las que no traen copia se completan en una sola consulta."""
+    providers = await providers_by_id(tx["provider_id"] for tx in txs if "sinpe_number" not in tx)
+    return [format_tx(tx, include_sinpe=True, provider=providers.get(tx["provider_id"])) for tx in txs]
+
+
+async def format_archived(tx: dict) -> dict:
+    result = (await format_txs([tx]))[0]
+    result["timeline"] = merge_timeline([format_event(e) for e in tx.get("events", [])], tx.get("timeline", []))
+    result["archived"] = True
+    return result
+
+
+async def apply_transition(tx: dict, from_statuses, status: str, actor: str, notes: str = "",
+                           fields: dict = None, session=None, guard: dict = None) -> dict:
+    """Cambia el estado solo si sigue en uno de `from_statuses` y registra el evento en el log.
+
+    El riesgo se calcula antes y viaja en la misma escritura: nadie puede ver el nuevo estado
+    sin su retención. `guard` agrega condiciones al filtro.
+    """
+    db = get_db()
+    now = datetime.utcnow()
+    query = {"_id": tx["_id"], "status": {"$in": list(from_statuses)}, **(guard or {})}
+    update = {"status": status, "updated_at": now, **to_storage(fields or {})}
+    # Se observa antes de puntuar para que el propio cambio cuente (velocidad, comprobante).
+    # observe es idempotente por (transacción, estado): el anuncio posterior no lo duplica, y
+    # si la escritura pierde la carrera (409) casi siempre fue contra este mismo cambio
+    candidate = {**tx, **(fields or {}), "status": status, "updated_at": now}
+    risk_engine.observe(candidate)
+    risk = risk_engine.evaluate(candidate)
+    if risk is not None:
+        # El riesgo se calculó sobre lo leído: si un admin lo cambió entretanto, se reintenta
+        query["risk"] = tx.get("risk")
+        update["risk"] = risk
+    updated = await db.transactions.find_one_and_update(
+        query,
+        {"$set": update},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if not updated:
+        raise HTTPException(status_code=409, detail="La transacción cambió de estado. Recarga e intenta de nuevo.")
+    await record_event(tx["_id"], status, actor, notes, now, session=session)
+    return updated
+
+
+async def announce_transition(updated: dict, actor: str):
+    # El motor de riesgo observa el cambio a través de la proyección
+    await pending_projection.announce(updated)
+    await notifications.notify_transaction(updated, actor)
+
+
+async def transition_tx(tx: dict, from_statuses, status: str, actor: str, notes: str = "", fields: dict = None,
+                        guard: dict = None) -> dict:
+    updated = await apply_transition(tx, from_statuses, status, actor, notes, fields, guard=guard)
+    await announce_transition(updated, actor)
+    return updated
 
 
 @router.post("/", summary="Crear transacción")
@@ -58,91 +133,203 @@ async def create_transaction(data: TransactionCreate, current_user=Depends(get_c
         raise HTTPException(status_code=400, detail="ID de proveedor inválido")
     if not provider:
         raise HTTPException(status_code=404, detail="Proveedor no encontrado")
-    if not provider.get("is_available"):
+    if not provider.get("is_available") or presence.is_stale(provider):
         raise HTTPException(status_code=400, detail="El negocio no está disponible en este momento")
     if data.requested_amount < provider.get("min_amount", 1000):
         raise HTTPException(status_code=400, detail=f"Monto mínimo: ₡{provider['min_amount']:,.0f}")
     if data.requested_amount > provider.get("max_amount", 100000):
         raise HTTPException(status_code=400, detail=f"Monto máximo: ₡{provider['max_amount']:,.0f}")
+    available = provider.get("available_liquidity")
+    if available is not None and data.requested_amount > available:
+        raise HTTPException(status_code=400, detail="El negocio no tiene suficiente efectivo disponible")
 
     # Verificar transacciones activas del usuario (máx 2)
     active_count = await db.transactions.count_documents({
         "user_id": current_user["id"],
-        "status": {"$in": ["requested", "accepted", "sinpe_sent", "proof_uploaded"]}
+        "status": {"$in": ACTIVE_STATUSES}
     })
     if active_count >= 2:
         raise HTTPException(status_code=400, detail="Tienes demasiadas transacciones activas. Completa o cancela las anteriores.")
 
     commission_data = calculate_commission(data.requested_amount)
 
-    doc = {
-        "transaction_code": generate_code(),
+    now = datetime.utcnow()
+    doc = to_storage({
+        "v": SCHEMA_VERSION,
+        "transaction_code": await generate_code(),
         "user_id": current_user["id"],
         "provider_id": data.provider_id,
-        "provider_name": provider["business_name"],
-        "sinpe_number": provider["sinpe_number"],
-        "sinpe_holder_name": provider["sinpe_holder_name"],
         "status": "requested",
         **commission_data,
-        "proof_s3_url": None,
-        "proof_uploaded_at": None,
-        "sinpe_sent_at": None,
-        "verified_at": None,
-        "completed_at": None,
-        "cancelled_at": None,
-        "timeline": [{"status": "requested", "timestamp": datetime.utcnow().isoformat(), "actor": current_user["id"], "notes": "Transacción creada"}],
-        "dispute": None,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow(),
-    }
+        **{field: provider.get(provider_field) for field, provider_field in PROVIDER_COPIES.items()},
+        "created_at": now,
+        "updated_at": now,
+    })
 
-    result = await db.transactions.insert_one(doc)
+    # Los códigos son únicos por secuencia; el reintento cubre choques con códigos aleatorios antiguos
+    for _ in range(3):
+        try:
+            result = await db.transactions.insert_one(doc)
+            break
+        except DuplicateKeyError:
+            doc.pop("_id", None)
+            doc["transaction_code"] = await generate_code()
+    else:
+        raise HTTPException(status_code=500, detail="No se pudo generar el código de transacción")
     doc["_id"] = result.inserted_id
-    return format_tx(doc, include_sinpe=True)
+    await record_event(doc["_id"], "requested", current_user["id"], "Transacción creada", doc["created_at"])
+    await pending_projection.announce(doc)
+    await risk_engine.assess(doc)
+    presence.remember_owner(data.provider_id, provider["user_id"])
+    await notifications.notify_transaction(doc, current_user["id"])
+    return format_tx(doc, include_sinpe=True, provider=provider)
 
 
-@router.get("/my", summary="Mis transacciones")
-async def get_my_transactions(current_user=Depends(get_current_user)):
+MAX_BATCH_IDS = 100
+
+
+async def user_transactions(user_id: str) -> list:
     db = get_db()
-    cursor = db.transactions.find({"user_id": current_user["id"]}).sort("created_at", -1).limit(50)
+    cursor = db.transactions.find({"user_id": user_id}).sort("created_at", -1).limit(50)
     txs = await cursor.to_list(length=50)
-    return [format_tx(tx, include_sinpe=True) for tx in txs]
+    return await format_txs(txs)
+
+
+async def provider_pending(provider_id: str) -> list:
+    if pending_projection.ready:
+        txs = pending_projection.get(provider_id)
+    else:
+        db = get_db()
+        cursor = db.transactions.find({
+            "provider_id": provider_id,
+            "status": {"$in": ACTIVE_STATUSES}
+        }).sort("created_at", -1)
+        txs = await cursor.to_list(length=50)
+    return await format_txs(txs)
+
+
+@router.get("/", summary="Varias transacciones por ID")
+async def get_transactions_batch(ids: str = Query(...), current_user=Depends(get_current_user)):
+    db = get_db()
+    try:
+        oids = list({ObjectId(i.strip()) for i in ids.split(",") if i.strip()})
+    except Exception:
+        raise HTTPException(status_code=400, detail="ID inválido")
+    if len(oids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_IDS} transacciones por consulta")
+
+    query = {"_id": {"$in": oids}}
+    if current_user["account_type"] != "superadmin":
+        # Solo las que le pertenecen; las ajenas simplemente no aparecen
+        owners = [{"user_id": current_user["id"]}]
+        provider = await db.providers.find_one({"user_id": current_user["id"]}, {"_id": 1})
+        if provider:
+            owners.append({"provider_id": str(provider["_id"])})
+        query["$or"] = owners
+
+    txs = await db.transactions.find(query).to_list(length=len(oids))
+    return await format_txs(txs)
+
+
+@router.get("/my", summary="Mis transacciones")
+async def get_my_transactions(current_user=Depends(get_current_user)):
+    return await user_transactions(current_user["id"])
 
 
 @router.get("/provider/pending", summary="Solicitudes pendientes del proveedor")
 async def get_provider_pending(current_user=Depends(get_current_user)):
     db = get_db()
-    provider = await db.providers.find_one({"user_id": current_user["id"]})
+    provider = await db.providers.find_one({"user_id": current_user["id"]}, {"_id": 1})
     if not provider:
         raise HTTPException(status_code=404, detail="No tienes perfil de proveedor")
+    return await provider_pending(str(provider["_id"]))
 
-    cursor = db.transactions.find({
-        "provider_id": str(provider["_id"]),
-        "status": {"$in": ["requested", "accepted", "sinpe_sent", "proof_uploaded"]}
-    }).sort("created_at", -1)
-    txs = await cursor.to_list(length=50)
-    return [format_tx(tx, include_sinpe=True) for tx in txs]
+
+async def ensure_tx_access(tx: dict, current_user: dict):
+    if current_user["account_type"] == "superadmin" or tx["user_id"] == current_user["id"]:
+        return
+    db = get_db()
+    provider = await db.providers.find_one({"user_id": current_user["id"]}, {"_id": 1})
+    if not provider or tx["provider_id"] != str(provider["_id"]):
+        raise HTTPException(status_code=403, detail="Sin acceso a esta transacción")
+
+
+@router.get("/by-code/{code}", summary="Buscar transacción por código")
+async def get_transaction_by_code(code: str, current_user=Depends(get_current_user)):
+    db = get_db()
+    code = code.strip().upper()
+    tx = await db.transactions.find_one({"transaction_code": code})
+    if not tx:
+        archived = await find_archived(code=code)
+        if not archived:
+            raise HTTPException(status_code=404, detail="Transacción no encontrada")
+        await ensure_tx_access(archived, current_user)
+        return await format_archived(archived)
+    await ensure_tx_access(tx, current_user)
+    return (await format_txs([tx]))[0]
 
 
 @router.get("/{tx_id}", summary="Ver transacción")
-async def get_transaction(tx_id: str, current_user=Depends(get_current_user)):
+async def get_transaction(
+    tx_id: str,
+    request: Request,
+    response: Response,
+    include_events: bool = Query(default=False),
+    current_user=Depends(get_current_user)
+):
     db = get_db()
+    # Primero solo lo necesario para permisos y ETag; el documento completo solo si cambió
     try:
-        tx = await db.transactions.find_one({"_id": ObjectId(tx_id)})
+        head = await db.transactions.find_one(
+            {"_id": ObjectId(tx_id)},
+            {"user_id": 1, "provider_id": 1, "updated_at": 1, "sinpe_number": 1},
+        )
     except Exception:
         raise HTTPException(status_code=400, detail="ID inválido")
+    if not head:
+        # Las transacciones viejas viven en el archivo; se leen de S3 solo cuando se piden
+        archived = await find_archived(tx_id=tx_id)
+        if not archived:
+            raise HTTPException(status_code=404, detail="Transacción no encontrada")
+        await ensure_tx_access(archived, current_user)
+        return await format_archived(archived)
+
+    await ensure_tx_access(head, current_user)
+    # Sin copia SINPE los datos salen del proveedor, así que su versión entra al ETag
+    provider = None
+    if "sinpe_number" not in head:
+        provider = (await providers_by_id([head["provider_id"]])).get(head["provider_id"])
+    provider_version = provider["updated_at"].isoformat() if provider else ""
+    cached = not_modified(request, response, make_etag(
+        "tx", tx_id, head["updated_at"].isoformat(), provider_version, include_events
+    ))
+    if cached:
+        return cached
+
+    tx = await db.transactions.find_one({"_id": head["_id"]})
     if not tx:
         raise HTTPException(status_code=404, detail="Transacción no encontrada")
+    result = format_tx(tx, include_sinpe=True, provider=provider)
+    if include_events:
+        result["timeline"] = await list_events(tx)
+    return result
 
-    provider = await db.providers.find_one({"user_id": current_user["id"]})
-    provider_id_str = str(provider["_id"]) if provider else None
 
-    is_owner = tx["user_id"] == current_user["id"] or tx["provider_id"] == provider_id_str
-    is_admin = current_user["account_type"] == "superadmin"
-    if not is_owner and not is_admin:
-        raise HTTPException(status_code=403, detail="Sin acceso a esta transacción")
+@router.get("/{tx_id}/events", summary="Historial de la transacción")
+async def get_transaction_events(tx_id: str, current_user=Depends(get_current_user)):
+    db = get_db()
+    try:
+        tx = await db.transactions.find_one(
+            {"_id": ObjectId(tx_id)},
+            {"user_id": 1, "provider_id": 1, "timeline": 1},
+        )
+    except Exception:
+        raise HTTPException(status_code=400, detail="ID inválido")
+    if not tx:
+        raise HTTPException(status_code=404, detail="Transacción no encontrada")
 
-    return format_tx(tx, include_sinpe=True)
+    await ensure_tx_access(tx, current_user)
+    return await list_events(tx)
 
 
 @router.patch("/{tx_id}/accept", summary="Proveedor acepta solicitud")
@@ -160,11 +347,18 @@ async def accept_transaction(tx_id: str, current_user=Depends(get_current_user))
     if tx["status"] != "requested":
         raise HTTPException(status_code=400, detail=f"No se puede aceptar — estado actual: {tx['status']}")
 
-    timeline = add_timeline_event(tx, "accepted", current_user["id"], "Proveedor aceptó la solicitud")
-    await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {"status": "accepted", "timeline": timeline, "updated_at": datetime.utcnow()}}
-    )
+    # Reservar la liquidez antes de aceptar evita comprometer más efectivo del declarado
+    amount = tx["requested_amount"]
+    if not await liquidity.reserve(tx["provider_id"], amount):
+        raise HTTPException(status_code=409, detail="No tienes suficiente liquidez disponible para aceptar")
+    try:
+        await transition_tx(
+            tx, ["requested"], "accepted", current_user["id"], "Proveedor aceptó la solicitud",
+            {"reserved_amount": amount}
+        )
+    except HTTPException:
+        await liquidity.release(tx["provider_id"], amount)
+        raise
     return {"status": "accepted", "message": "Solicitud aceptada. El usuario enviará el SINPE."}
 
 
@@ -179,10 +373,9 @@ async def mark_sinpe_sent(tx_id: str, current_user=Depends(get_current_user)):
     if tx["status"] != "accepted":
         raise HTTPException(status_code=400, detail=f"Estado actual: {tx['status']}")
 
-    timeline = add_timeline_event(tx, "sinpe_sent", current_user["id"], "Usuario marcó SINPE como enviado")
-    await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {"status": "sinpe_sent", "sinpe_sent_at": datetime.utcnow(), "timeline": timeline, "updated_at": datetime.utcnow()}}
+    await transition_tx(
+        tx, ["accepted"], "sinpe_sent", current_user["id"], "Usuario marcó SINPE como enviado",
+        {"sinpe_sent_at": datetime.utcnow()}
     )
     return {"status": "sinpe_sent"}
 
@@ -202,18 +395,22 @@ async def upload_transaction_proof(
     if tx["status"] not in ("sinpe_sent", "accepted"):
         raise HTTPException(status_code=400, detail=f"Estado actual: {tx['status']}")
 
-    proof_url = await upload_proof(file, tx_id)
-    timeline = add_timeline_event(tx, "proof_uploaded", current_user["id"], "Comprobante subido")
-    await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {
-            "status": "proof_uploaded",
-            "proof_s3_url": proof_url,
-            "proof_uploaded_at": datetime.utcnow(),
-            "timeline": timeline,
-            "updated_at": datetime.utcnow()
-        }}
+    contents = await file.read()
+    await file.seek(0)
+    (hashes, duplicates), proof_url = await asyncio.gather(fingerprint(contents, tx_id), upload_proof(file, tx_id))
+    fields = {
+        "proof_s3_url": proof_url,
+        "proof_uploaded_at": datetime.utcnow(),
+        "proof_sha256": hashes["sha256"],
+        "proof_dhash": hashes["dhash"],
+    }
+    if duplicates:
+        # El motor de riesgo retiene la transacción antes de que el proveedor verifique
+        fields["proof_duplicates"] = duplicates
+    updated = await transition_tx(
+        tx, ["sinpe_sent", "accepted"], "proof_uploaded", current_user["id"], "Comprobante subido", fields
     )
+    await register_proof(updated, hashes)
     return {"status": "proof_uploaded", "proof_url": proof_url}
 
 
@@ -231,12 +428,21 @@ async def verify_transaction(tx_id: str, current_user=Depends(get_current_user))
         raise HTTPException(status_code=403, detail="Sin permisos")
     if tx["status"] != "proof_uploaded":
         raise HTTPException(status_code=400, detail=f"Estado actual: {tx['status']}")
+    held = HTTPException(status_code=409, detail="Transacción retenida para revisión. No entregues el efectivo todavía.")
+    if is_held(tx):
+        raise held
 
-    timeline = add_timeline_event(tx, "verified", current_user["id"], "SINPE verificado por proveedor")
-    await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {"status": "verified", "verified_at": datetime.utcnow(), "timeline": timeline, "updated_at": datetime.utcnow()}}
-    )
+    # La retención se vuelve a comprobar en el filtro: pudo escribirse después de la lectura
+    try:
+        await transition_tx(
+            tx, ["proof_uploaded"], "verified", current_user["id"], "SINPE verificado por proveedor",
+            {"verified_at": datetime.utcnow()}, guard={"risk.held": {"$ne": True}}
+        )
+    except HTTPException:
+        current = await db.transactions.find_one({"_id": tx["_id"]}, {"risk": 1})
+        if current and is_held(current):
+            raise held
+        raise
     return {"status": "verified", "message": "SINPE verificado. Entrega el efectivo."}
 
 
@@ -255,19 +461,30 @@ async def complete_transaction(tx_id: str, current_user=Depends(get_current_user
     if tx["status"] != "verified":
         raise HTTPException(status_code=400, detail=f"Estado actual: {tx['status']}")
 
-    timeline = add_timeline_event(tx, "completed", current_user["id"], "Efectivo entregado")
-    await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {"status": "completed", "completed_at": datetime.utcnow(), "timeline": timeline, "updated_at": datetime.utcnow()}}
-    )
-
-    # Actualizar estadísticas del proveedor
-    await db.providers.update_one(
-        {"_id": provider["_id"]},
-        {"$inc": {"total_transactions": 1, "total_volume": tx["requested_amount"]}}
-    )
-    await db.users.update_one({"_id": ObjectId(tx["user_id"])}, {"$inc": {"total_transactions": 1}})
-
+    # Estado, evento, liquidez y contadores se confirman juntos o no se confirman
+    async def bookkeeping(session):
+        updated = await apply_transition(
+            tx, ["verified"], "completed", current_user["id"], "Efectivo entregado",
+            {"completed_at": datetime.utcnow()}, session=session
+        )
+        if updated.get("reserved_amount"):
+            await liquidity.consume(tx["provider_id"], updated["reserved_amount"], session=session)
+        now = datetime.utcnow()
+        await db.providers.update_one(
+            {"_id": provider["_id"]},
+            {"$inc": {"total_transactions": 1, "total_volume": tx["requested_amount"]}, "$set": {"updated_at": now}},
+            session=session,
+        )
+        await db.users.update_one(
+            {"_id": ObjectId(tx["user_id"])},
+            {"$inc": {"total_transactions": 1}, "$set": {"updated_at": now}},
+            session=session,
+        )
+        return updated
+
+    updated = await run_in_transaction(bookkeeping)
+    await invalidate("provider", tx["provider_id"])
+    await announce_transition(updated, current_user["id"])
     return {"status": "completed", "message": "¡Transacción completada!"}
 
 
@@ -287,11 +504,12 @@ async def cancel_transaction(tx_id: str, current_user=Depends(get_current_user))
     if tx["status"] in ("completed", "cancelled"):
         raise HTTPException(status_code=400, detail="No se puede cancelar")
 
-    timeline = add_timeline_event(tx, "cancelled", current_user["id"], "Cancelada por participante")
-    await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {"status": "cancelled", "cancelled_at": datetime.utcnow(), "timeline": timeline, "updated_at": datetime.utcnow()}}
+    updated = await transition_tx(
+        tx, [tx["status"]], "cancelled", current_user["id"], "Cancelada por participante",
+        {"cancelled_at": datetime.utcnow()}
     )
+    if updated.get("reserved_amount"):
+        await liquidity.release(tx["provider_id"], updated["reserved_amount"])
     return {"status": "cancelled"}
 
 
@@ -310,10 +528,9 @@ async def open_dispute(tx_id: str, data: DisputeCreate, current_user=Depends(get
     if tx["status"] in ("completed", "cancelled", "disputed"):
         raise HTTPException(status_code=400, detail=f"Estado actual: {tx['status']}")
 
-    dispute = {"reason": data.reason, "opened_by": current_user["id"], "opened_at": datetime.utcnow().isoformat(), "resolved_at": None, "resolution": None}
-    timeline = add_timeline_event(tx, "disputed", current_user["id"], f"Disputa: {data.reason}")
-    await db.transactions.update_one(
-        {"_id": ObjectId(tx_id)},
-        {"$set": {"status": "disputed", "dispute": dispute, "timeline": timeline, "updated_at": datetime.utcnow()}}
+    dispute = {"reason": data.reason, "opened_by": current_user["id"], "opened_at": datetime.utcnow().isoformat()}
+    await transition_tx(
+        tx, [tx["status"]], "disputed", current_user["id"], f"Disputa: {data.reason}",
+        {"dispute": dispute}
     )
     return {"status": "disputed", "message": "Disputa abierta. Un administrador la revisará."}
@@ -0,0 +1,35 @@
+"""Archiva en S3 las transacciones completadas o canceladas más viejas que el corte.
+
+    python scripts/archive_transactions.py --older-than-days 180 --batch-size 1000
+
+Pensado para correr como cron (por ejemplo, un servicio cron de Railway).
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db  # noqa: E402
+from services.archive import archive_transactions  # noqa: E402
+
+
+async def run(args):
+    await connect_db()
+    try:
+        result = await archive_transactions(args.older_than_days, args.batch_size)
+        print(f"📦 {result['archived']} transacciones archivadas (anteriores a {result['cutoff']:%Y-%m-%d})")
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--older-than-days", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Calcula los trigramas de búsqueda (`search_grams`) de proveedores y usuarios existentes.
+
+    python scripts/backfill_search.py --batch-size 1000
+
+Solo toca documentos que aún no los tienen; se puede interrumpir y volver a correr.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db  # noqa: E402
+from services.search import backfill_search_grams, GRAM_SOURCES  # noqa: E402
+
+
+async def run(args):
+    await connect_db()
+    try:
+        for collection in GRAM_SOURCES:
+            updated = await backfill_search_grams(collection, args.batch_size)
+            print(f"🔤 {collection}: {updated} documentos actualizados")
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Costo de autenticación por petición: verificación JWT completa contra la caché de tokens.
+
+    python scripts/bench_auth.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key")
+
+from middleware import auth  # noqa: E402
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = auth.create_access_token({"sub": "0" * 24, "account_type": "user"})
+    payload = auth.decode_token(token)
+    key = auth.token_key(token)
+    auth._cache_put(key, payload, {"id": "0" * 24, "account_type": "user"})
+
+    def cached():
+        entry = auth._cache_get(auth.token_key(token))
+        auth.revocations.is_revoked(entry[0])
+
+    full = per_call_us(lambda: auth.decode_token(token), args.iterations)
+    fast = per_call_us(cached, args.iterations)
+    print(f"jwt.decode completo: {full:8.2f} µs/petición (+ users.find_one)")
+    print(f"caché de tokens:     {fast:8.2f} µs/petición (sin consulta)")
+    print(f"mejora:              {full / fast:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
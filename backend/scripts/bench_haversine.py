@@ -0,0 +1,54 @@
+"""Haversine escalar (math) contra la versión vectorizada de NumPy.
+
+    python scripts/bench_haversine.py --sizes 1000,100000,1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.geo import haversine, haversine_np, k_nearest  # noqa: E402
+
+# Alrededor de San José, Costa Rica
+ORIGIN = (9.9281, -84.0907)
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'puntos':>10} {'escalar s':>10} {'numpy s':>10} {'speedup':>8} {'k=20 s':>8}")
+    for n in [int(s) for s in args.sizes.split(",")]:
+        lats = ORIGIN[0] + rng.normal(0, 0.3, n)
+        lngs = ORIGIN[1] + rng.normal(0, 0.3, n)
+        lat_list, lng_list = lats.tolist(), lngs.tolist()
+
+        scalar = timed(lambda: [haversine(ORIGIN[0], ORIGIN[1], a, b) for a, b in zip(lat_list, lng_list)], repeat=1)
+        vector = timed(lambda: haversine_np(ORIGIN[0], ORIGIN[1], lats, lngs))
+        knn = timed(lambda: k_nearest(ORIGIN[0], ORIGIN[1], lats, lngs, 20))
+
+        check = haversine_np(ORIGIN[0], ORIGIN[1], lats[:100], lngs[:100])
+        expected = [haversine(ORIGIN[0], ORIGIN[1], a, b) for a, b in zip(lat_list[:100], lng_list[:100])]
+        assert np.allclose(check, expected), "Las implementaciones no coinciden"
+
+        print(f"{n:>10} {scalar:>10.4f} {vector:>10.4f} {scalar / vector:>7.1f}x {knn:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Latencia de búsqueda de comprobantes duplicados contra un millón de hashes guardados.
+
+    python scripts/bench_proof_hashes.py --hashes 1000000 --queries 1000
+
+Llena una colección temporal con hashes aleatorios, mide la búsqueda exacta por sha256 y la de
+vecinos por bandas de dHash (consultando versiones de hashes guardados con hasta MAX_DISTANCE
+bits cambiados) y la compara con un barrido lineal en NumPy. La colección se borra al terminar.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db, get_db  # noqa: E402
+from services.proofs import bands, BAND_CANDIDATES, MAX_DISTANCE  # noqa: E402
+
+COLLECTION = "bench_proof_hashes"
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))] * 1000  # noqa: E731
+    return f"p50 {pick(0.5):.2f}ms  p95 {pick(0.95):.2f}ms  p99 {pick(0.99):.2f}ms"
+
+
+def flip_bits(rng: random.Random, value: int, n: int) -> int:
+    for bit in rng.sample(range(64), n):
+        value ^= 1 << bit
+    return value
+
+
+async def run(args):
+    await connect_db()
+    db = get_db()
+    collection = db[COLLECTION]
+    rng = random.Random(args.seed)
+    try:
+        await collection.drop()
+        values = [rng.getrandbits(64) for _ in range(args.hashes)]
+        start = time.perf_counter()
+        for i in range(0, args.hashes, 10000):
+            await collection.insert_many([{
+                "tx_id": f"tx{i + j}",
+                "sha256": f"{rng.getrandbits(256):064x}",
+                "dhash": f"{v:016x}",
+                "bands": bands(v),
+            } for j, v in enumerate(values[i:i + 10000])], ordered=False)
+        await collection.create_index("sha256")
+        await collection.create_index([("bands", 1), ("_id", -1)])
+        print(f"📥 {args.hashes:,} hashes cargados e indexados en {time.perf_counter() - start:.1f}s")
+
+        sample = await collection.aggregate([{"$sample": {"size": args.queries}}]).to_list(length=args.queries)
+        exact = []
+        for doc in sample:
+            t = time.perf_counter()
+            await collection.find_one({"sha256": doc["sha256"]}, {"tx_id": 1})
+            exact.append(time.perf_counter() - t)
+        print(f"sha256 exacto:        {percentiles(exact)}")
+
+        near, found = [], 0
+        for doc in sample:
+            probe = flip_bits(rng, int(doc["dhash"], 16), rng.randint(0, MAX_DISTANCE))
+            t = time.perf_counter()
+            candidates = []
+            for band in bands(probe):
+                candidates += await collection.find({"bands": band}, {"dhash": 1}) \
+                    .sort("_id", -1).limit(BAND_CANDIDATES).to_list(length=BAND_CANDIDATES)
+            hit = any(bin(probe ^ int(c["dhash"], 16)).count("1") <= MAX_DISTANCE for c in candidates)
+            near.append(time.perf_counter() - t)
+            found += hit
+        print(f"dHash por bandas:     {percentiles(near)}  ({found}/{len(sample)} vecinos encontrados)")
+
+        table = np.array(values, dtype=np.uint64)
+        linear = []
+        for doc in sample[:min(len(sample), 100)]:
+            probe = np.uint64(int(doc["dhash"], 16))
+            t = time.perf_counter()
+            xor = np.bitwise_xor(table, probe)
+            distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+            np.flatnonzero(distances <= MAX_DISTANCE)
+            linear.append(time.perf_counter() - t)
+        print(f"barrido NumPy lineal: {percentiles(linear)}")
+    finally:
+        if not args.keep:
+            await collection.drop()
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hashes", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="no borrar la colección temporal")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
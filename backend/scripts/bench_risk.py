@@ -0,0 +1,75 @@
+"""Latencia por evento del motor de riesgo (observe + score) con eventos sintéticos.
+
+    python scripts/bench_risk.py --events 200000 --users 20000 --providers 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.risk import RiskEngine  # noqa: E402
+
+LIFECYCLE = ["requested", "accepted", "sinpe_sent", "proof_uploaded", "verified", "completed"]
+
+
+def synthetic_events(rng: random.Random, n: int, users: int, providers: int):
+    """Transacciones entrelazadas: cada una emite su ciclo de vida, con ~15% canceladas."""
+    now = datetime(2026, 1, 1)
+    active = []
+    tx_n = 0
+    for _ in range(n):
+        if not active or rng.random() < 0.2:
+            tx_n += 1
+            active.append({
+                "_id": f"tx{tx_n}", "user_id": f"u{rng.randrange(users)}", "provider_id": f"p{rng.randrange(providers)}",
+                "requested_amount": float(rng.randrange(1000, 100000, 500)), "step": 0,
+            })
+        tx = active[rng.randrange(len(active))]
+        now += timedelta(seconds=rng.expovariate(1 / 2))
+        if tx["step"] > 0 and rng.random() < 0.03:
+            status = "cancelled"
+        else:
+            status = LIFECYCLE[tx["step"]]
+        event = {**tx, "status": status, "updated_at": now}
+        if status == "proof_uploaded":
+            event["proof_sha256"] = f"h{rng.randrange(tx_n * 50)}"
+        yield event
+        tx["step"] += 1
+        if status in ("completed", "cancelled"):
+            active.remove(tx)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--providers", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    events = list(synthetic_events(random.Random(args.seed), args.events, args.users, args.providers))
+    engine = RiskEngine()
+    latencies = []
+    flagged = 0
+    for event in events:
+        start = time.perf_counter()
+        engine.observe(event)
+        score, _ = engine.score(event)
+        latencies.append(time.perf_counter() - start)
+        flagged += score > 0
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6
+
+    total = sum(latencies)
+    print(f"{len(events):,} eventos en {total:.3f}s ({len(events) / total:,.0f} eventos/s), {flagged:,} con puntaje > 0")
+    print(f"p50 {pct(0.5):.1f}µs  p95 {pct(0.95):.1f}µs  p99 {pct(0.99):.1f}µs  máx {latencies[-1] * 1e6:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
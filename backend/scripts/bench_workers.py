@@ -0,0 +1,121 @@
+"""Throughput de la API con 1..N workers de uvicorn.
+
+Levanta el servidor local con cada cantidad de workers y mide peticiones por segundo
+sobre /providers/nearby y sobre el ciclo completo de una transacción.
+
+    python scripts/bench_workers.py --workers 1,2,4 \\
+        --user-tokens TOKEN_A,TOKEN_B --provider-token TOKEN_P --provider-id ID \\
+        --lat 9.9281 --lng -84.0907
+
+Requiere una base con datos y, con más de un worker, REDIS_URL.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.3)
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+
+async def bench_nearby(client, args, total: int) -> float:
+    sem = asyncio.Semaphore(args.concurrency)
+    headers = {"Authorization": f"Bearer {args.user_tokens[0]}"}
+    params = {"lat": args.lat, "lng": args.lng, "amount": args.amount}
+
+    async def one():
+        async with sem:
+            r = await client.get("/providers/nearby", params=params, headers=headers)
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def lifecycle(client, args, user_token: str):
+    user = {"Authorization": f"Bearer {user_token}"}
+    prov = {"Authorization": f"Bearer {args.provider_token}"}
+    r = await client.post("/transactions/", json={"provider_id": args.provider_id, "requested_amount": args.amount}, headers=user)
+    r.raise_for_status()
+    tx_id = r.json()["id"]
+    (await client.patch(f"/transactions/{tx_id}/accept", headers=prov)).raise_for_status()
+    (await client.patch(f"/transactions/{tx_id}/sinpe-sent", headers=user)).raise_for_status()
+    files = {"file": ("proof.png", b"\x89PNG\r\n\x1a\n", "image/png")}
+    (await client.post(f"/transactions/{tx_id}/proof", files=files, headers=user)).raise_for_status()
+    (await client.patch(f"/transactions/{tx_id}/verify", headers=prov)).raise_for_status()
+    (await client.patch(f"/transactions/{tx_id}/complete", headers=prov)).raise_for_status()
+
+
+async def bench_lifecycle(client, args, total: int) -> float:
+    # Cada usuario admite pocas transacciones activas: una cola secuencial por token
+    per_user = max(1, total // len(args.user_tokens))
+
+    async def run_user(token):
+        for _ in range(per_user):
+            await lifecycle(client, args, token)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_user(t) for t in args.user_tokens))
+    return per_user * len(args.user_tokens) / (time.perf_counter() - start)
+
+
+async def run(args, workers: int):
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        await wait_ready(base_url)
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"{base_url}/api/v1", limits=limits, timeout=30) as client:
+            await bench_nearby(client, args, args.concurrency)  # calentamiento
+            nearby = await bench_nearby(client, args, args.requests)
+            cycles = await bench_lifecycle(client, args, args.cycles) if args.provider_token else None
+    finally:
+        proc.terminate()
+        proc.wait()
+    return nearby, cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--user-tokens", required=True, type=lambda s: s.split(","))
+    parser.add_argument("--provider-token", default="")
+    parser.add_argument("--provider-id", default="")
+    parser.add_argument("--lat", type=float, default=9.9281)
+    parser.add_argument("--lng", type=float, default=-84.0907)
+    parser.add_argument("--amount", type=float, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--cycles", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'nearby req/s':>14} {'ciclos/s':>10}")
+    for workers in [int(w) for w in args.workers.split(",")]:
+        nearby, cycles = asyncio.run(run(args, workers))
+        print(f"{workers:>8} {nearby:>14.1f} {cycles if cycles is None else f'{cycles:.2f}':>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Compara los contadores de proveedores y usuarios con sus transacciones completadas.
+
+    python scripts/check_drift.py --repair --batch-size 500
+
+Sin --repair solo reporta. Incluye lo archivado en S3 a través de `archive_rollups`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db  # noqa: E402
+from services.drift import check_drift  # noqa: E402
+
+
+async def run(args):
+    await connect_db()
+    try:
+        report = await check_drift(args.repair, args.batch_size, args.confirm_delay)
+        for kind, stats in report.items():
+            print(f"🔎 {kind}: {stats['checked']} revisados, {stats['drifted']} desviados, {stats['repaired']} corregidos")
+        if args.verbose:
+            print(json.dumps({k: v["samples"] for k, v in report.items()}, indent=2, ensure_ascii=False))
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repair", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--confirm-delay", type=float, default=5, help="segundos antes de reconfirmar y corregir")
+    parser.add_argument("--verbose", action="store_true", help="mostrar ejemplos de desviaciones")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
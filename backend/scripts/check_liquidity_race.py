@@ -0,0 +1,75 @@
+"""Reservas concurrentes contra un mismo proveedor: ninguna combinación debe sobrerreservar.
+
+    python scripts/check_liquidity_race.py --declared 100000 --amount 7000 --concurrency 200
+
+Crea un proveedor temporal con la liquidez declarada, lanza todas las reservas a la vez
+(cada una en su propia conexión del pool) y comprueba que se aceptan exactamente las que
+caben, que lo reservado nunca supera lo declarado y que liberar todo deja la cuenta en cero.
+Borra el proveedor al terminar.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db, get_db  # noqa: E402
+from services import liquidity  # noqa: E402
+
+
+async def run(args):
+    await connect_db()
+    db = get_db()
+    now = datetime.utcnow()
+    result = await db.providers.insert_one({
+        "user_id": "liquidity-race",
+        "business_name": "Prueba de reservas",
+        "is_available": False,
+        "declared_liquidity": args.declared,
+        "reserved_liquidity": 0.0,
+        "available_liquidity": args.declared,
+        "created_at": now,
+        "updated_at": now,
+    })
+    provider_id = str(result.inserted_id)
+    checks = []
+    try:
+        for round_ in range(args.rounds):
+            accepted = await asyncio.gather(*(
+                liquidity.reserve(provider_id, args.amount) for _ in range(args.concurrency)
+            ))
+            provider = await db.providers.find_one({"_id": result.inserted_id})
+            expected = min(args.concurrency, int(args.declared // args.amount))
+            reserved = provider["reserved_liquidity"]
+            print(f"🔎 Ronda {round_ + 1}: {sum(accepted)} aceptadas de {args.concurrency}, reservado ₡{reserved:,.0f}")
+            checks.append((f"ronda {round_ + 1}: se aceptan exactamente {expected}", sum(accepted) == expected))
+            checks.append((f"ronda {round_ + 1}: reservado no supera lo declarado", reserved <= args.declared))
+            checks.append((f"ronda {round_ + 1}: disponible = declarado - reservado",
+                           abs(provider["available_liquidity"] - (args.declared - reserved)) < 0.01))
+
+            await asyncio.gather(*(liquidity.release(provider_id, args.amount) for ok in accepted if ok))
+            provider = await db.providers.find_one({"_id": result.inserted_id})
+            checks.append((f"ronda {round_ + 1}: liberar todo deja la reserva en cero", provider["reserved_liquidity"] == 0))
+    finally:
+        await db.providers.delete_one({"_id": result.inserted_id})
+        await close_db()
+
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    if not all(ok for _, ok in checks):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--declared", type=float, default=100000)
+    parser.add_argument("--amount", type=float, default=7000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Harness de la proyección de pendientes contra un MongoDB real: change streams y modo bus.
+
+    python scripts/check_pending_stream.py --timeout 5
+
+Con un replica set (por ejemplo `mongod --replSet rs0` y `rs.initiate()`) comprueba que el
+stream propaga inserciones, cierres y borrados, y que al reabrirlo con el resume token se
+aplican los cambios hechos mientras estaba cerrado sin volver a leer toda la colección.
+Contra un servidor standalone comprueba que la proyección cae a modo bus. En ambos casos
+comprueba el modo bus: `announce` local e invalidaciones como las de otro worker.
+Usa un proveedor ficticio y borra sus transacciones al terminar.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db, get_db  # noqa: E402
+from services.pending import PendingProjection  # noqa: E402
+from services.state import invalidate  # noqa: E402
+
+
+async def wait_until(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return predicate()
+
+
+def pending_ids(projection, provider_id: str) -> set:
+    return {str(tx["_id"]) for tx in projection.get(provider_id, limit=1000)}
+
+
+async def insert_tx(db, provider_id: str) -> str:
+    now = datetime.utcnow()
+    result = await db.transactions.insert_one({
+        "transaction_code": f"HARNESS-{uuid.uuid4().hex[:12].upper()}",
+        "user_id": "harness",
+        "provider_id": provider_id,
+        "status": "requested",
+        "requested_amount": 1000,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return str(result.inserted_id)
+
+
+async def close_tx(db, tx_id: str, status: str = "completed"):
+    await db.transactions.update_one(
+        {"_id": ObjectId(tx_id)}, {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+    )
+
+
+async def check_change_stream(db, projection, provider_id: str, timeout: float, results: list):
+    tx_id = await insert_tx(db, provider_id)
+    results.append(("inserción llega por el stream",
+                    await wait_until(lambda: tx_id in pending_ids(projection, provider_id), timeout)))
+    await close_tx(db, tx_id)
+    results.append(("transacción cerrada sale de la cola",
+                    await wait_until(lambda: tx_id not in pending_ids(projection, provider_id), timeout)))
+
+    # Reanudación: se cierra el stream, se escribe y se reabre solo con el resume token
+    kept = await insert_tx(db, provider_id)
+    await wait_until(lambda: kept in pending_ids(projection, provider_id), timeout)
+    token = projection._resume_token
+    await projection.stop()
+    await close_tx(db, kept, "cancelled")
+    added = await insert_tx(db, provider_id)
+
+    resyncs = []
+    original_resync = projection.resync
+
+    async def counting_resync():
+        resyncs.append(time.monotonic())
+        await original_resync()
+
+    projection.resync = counting_resync
+    projection._task = asyncio.create_task(projection._watch())
+    ids = lambda: pending_ids(projection, provider_id)  # noqa: E731
+    results.append(("cambios con el stream cerrado se aplican al reanudar",
+                    await wait_until(lambda: added in ids() and kept not in ids(), timeout)))
+    results.append(("la reanudación no relee la colección", not resyncs))
+    results.append(("el resume token avanza", projection._resume_token not in (None, token)))
+
+    await db.transactions.delete_one({"_id": ObjectId(added)})
+    results.append(("borrado sale de la cola", await wait_until(lambda: added not in ids(), timeout)))
+
+
+async def check_bus(db, provider_id: str, timeout: float, results: list):
+    """Una proyección sin stream, como en un standalone, alimentada por anuncios e invalidaciones."""
+    bus = PendingProjection()
+    await bus.start()
+    await bus.stop()
+    bus.mode = "bus"
+
+    tx_id = await insert_tx(db, provider_id)
+    tx = await db.transactions.find_one({"_id": ObjectId(tx_id)})
+    await bus.announce(tx)
+    results.append(("bus: announce publica en la proyección local", tx_id in pending_ids(bus, provider_id)))
+
+    # Otro worker cambió el estado y solo avisó: la proyección relee el documento
+    await close_tx(db, tx_id)
+    await invalidate("transaction", tx_id)
+    results.append(("bus: invalidación relee y saca la transacción",
+                    await wait_until(lambda: tx_id not in pending_ids(bus, provider_id), timeout)))
+
+
+async def run(args):
+    await connect_db()
+    db = get_db()
+    provider_id = f"harness-{uuid.uuid4().hex}"
+    results = []
+    projection = PendingProjection()
+    try:
+        await projection.start()
+        await wait_until(lambda: projection.mode == "change_stream" or projection._task.done(), args.timeout)
+        if projection.mode == "change_stream":
+            print("🔎 Replica set: probando change streams")
+            await check_change_stream(db, projection, provider_id, args.timeout, results)
+        else:
+            print("🔎 Standalone: probando el cambio a modo bus")
+            results.append(("standalone cae a modo bus", projection.mode == "bus" and projection._task.done()))
+        await projection.stop()
+        await check_bus(db, provider_id, args.timeout, results)
+    finally:
+        await projection.stop()
+        await db.transactions.delete_many({"provider_id": provider_id})
+        await close_db()
+
+    for name, ok in results:
+        print(f"{'✅' if ok else '❌'} {name}")
+    if not all(ok for _, ok in results):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--timeout", type=float, default=5, help="segundos de espera por cada cambio")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
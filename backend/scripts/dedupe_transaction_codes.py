@@ -0,0 +1,65 @@
+"""Reasigna códigos de transacción repetidos y crea el índice único sobre `transaction_code`.
+
+    python scripts/dedupe_transaction_codes.py --dry-run
+
+Los códigos aleatorios antiguos pueden repetirse; mientras existan duplicados `connect_db`
+no puede crear el índice único y deja uno normal. Por cada código repetido se conserva
+la transacción más antigua y las demás reciben un código nuevo de la secuencia.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db, get_db, ensure_code_index  # noqa: E402
+from services.codes import generate_code  # noqa: E402
+
+
+async def find_duplicates(db) -> list:
+    pipeline = [
+        {"$group": {"_id": "$transaction_code", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ]
+    return await db.transactions.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+
+async def run(args):
+    await connect_db()
+    db = get_db()
+    try:
+        groups = await find_duplicates(db)
+        extra = sum(len(g["ids"]) - 1 for g in groups)
+        print(f"🔎 {len(groups)} códigos repetidos, {extra} transacciones por renombrar")
+        if args.dry_run:
+            for g in groups[:20]:
+                print(f"   {g['_id']}: {len(g['ids'])}")
+            return
+        renamed = 0
+        for g in groups:
+            # El _id lleva la fecha de creación: se conserva el más antiguo
+            for oid in sorted(g["ids"])[1:]:
+                code = await generate_code()
+                result = await db.transactions.update_one(
+                    {"_id": oid, "transaction_code": g["_id"]},
+                    {"$set": {"transaction_code": code, "previous_code": g["_id"]}},
+                )
+                renamed += result.modified_count
+        print(f"✅ {renamed} transacciones con código nuevo")
+        if await ensure_code_index(db):
+            print("✅ Índice único de transaction_code creado")
+        else:
+            print("⚠️ Siguen existiendo duplicados (¿escrituras concurrentes?); vuelve a correr el script")
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="solo reportar los duplicados")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
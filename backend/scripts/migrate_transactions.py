@@ -0,0 +1,79 @@
+"""Migra transacciones al formato v2 (sin nulos ni valores por defecto, nombres cortos).
+
+    python scripts/migrate_transactions.py --batch-size 1000 --sleep 0.2
+
+Corre con la app en línea: cada documento se actualiza solo si no cambió desde que se leyó;
+los que se saltan quedan para la siguiente pasada. Se puede interrumpir y volver a correr.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import UpdateOne  # noqa: E402
+from database import connect_db, close_db, get_db  # noqa: E402
+from models.transaction import SCHEMA_VERSION, STORED_NAMES, COMMISSION_RATE  # noqa: E402
+
+
+def upgrade(doc: dict):
+    """Operación que lleva un documento v1 a v2, condicionada a su `updated_at`."""
+    set_fields, unset_fields = {"v": SCHEMA_VERSION}, {}
+    for field, value in doc.items():
+        if field == "_id":
+            continue
+        # La copia SINPE del proveedor se conserva: es el destino del pago de esa transacción
+        if value is None or (field == "commission_rate" and value == COMMISSION_RATE):
+            unset_fields[field] = ""
+        elif field in STORED_NAMES:
+            set_fields[STORED_NAMES[field]] = value
+            unset_fields[field] = ""
+    dispute = doc.get("dispute")
+    if isinstance(dispute, dict) and any(v is None for v in dispute.values()):
+        set_fields["dispute"] = {k: v for k, v in dispute.items() if v is not None}
+    update = {"$set": set_fields}
+    if unset_fields:
+        update["$unset"] = unset_fields
+    return UpdateOne({"_id": doc["_id"], "v": {"$exists": False}, "updated_at": doc["updated_at"]}, update)
+
+
+async def run(args):
+    await connect_db()
+    db = get_db()
+    try:
+        migrated, skipped, last_id = 0, 0, None
+        start = time.perf_counter()
+        while True:
+            query = {"v": {"$exists": False}}
+            if last_id:
+                query["_id"] = {"$gt": last_id}
+            docs = await db.transactions.find(query).sort("_id", 1).limit(args.batch_size).to_list(length=args.batch_size)
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+            if not args.dry_run:
+                result = await db.transactions.bulk_write([upgrade(d) for d in docs], ordered=False)
+                migrated += result.modified_count
+                skipped += len(docs) - result.modified_count
+            else:
+                migrated += len(docs)
+            print(f"  {migrated:,} migradas, {skipped:,} cambiaron durante la pasada", end="\r")
+            await asyncio.sleep(args.sleep)
+        remaining = await db.transactions.count_documents({"v": {"$exists": False}})
+        print(f"🧹 {migrated:,} transacciones migradas en {time.perf_counter() - start:.1f}s; quedan {remaining:,} en v1")
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--sleep", type=float, default=0.2, help="pausa entre lotes para no competir con la app")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
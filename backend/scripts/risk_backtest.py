@@ -0,0 +1,52 @@
+"""Puntúa transacciones históricas con el motor de riesgo para ajustar umbrales.
+
+    python scripts/risk_backtest.py --since 2026-01-01 --chunk 5000
+
+Los umbrales salen de la configuración (RISK_FLAG_SCORE, RISK_HOLD_SCORE, ...); no escribe nada.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import connect_db, close_db  # noqa: E402
+from services.risk import score_history  # noqa: E402
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+async def run(args):
+    await connect_db()
+    try:
+        start = time.perf_counter()
+        stats = await score_history(args.since, args.until, args.chunk)
+        elapsed = time.perf_counter() - start
+        flagged, disputed = stats["flagged"], stats["disputed"]
+        print(f"🧮 {stats['transactions']:,} transacciones, {stats['events']:,} eventos en {elapsed:.1f}s")
+        print(f"   marcadas: {flagged:,}  retenidas: {stats['held']:,}  disputadas: {disputed:,}")
+        if flagged:
+            print(f"   precisión (marcadas que terminaron en disputa): {stats['flagged_disputed'] / flagged:.1%}")
+        if disputed:
+            print(f"   cobertura (disputas que se habrían marcado): {stats['flagged_disputed'] / disputed:.1%}")
+        for reason, count in sorted(stats["reasons"].items(), key=lambda r: -r[1]):
+            print(f"   {reason:<22} {count:,}")
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--since", type=parse_date, default=None)
+    parser.add_argument("--until", type=parse_date, default=None)
+    parser.add_argument("--chunk", type=int, default=5000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Genera datos sintéticos y deterministas para pruebas de rendimiento.
+
+    python scripts/seed.py --users 100000 --providers 5000 --transactions 2000000 --seed 42
+
+Crea usuarios, proveedores agrupados alrededor de ciudades de Costa Rica y transacciones
+en todos los estados con su log de eventos. Con la misma semilla produce los mismos
+documentos (incluidos los _id), con fechas relativas a un instante fijo; --relative-now
+mueve todo el historial a hoy a costa de ese determinismo.
+El estado vivo siempre usa la hora real: `last_seen_at` de los proveedores y la aceptación
+de las reservas abiertas. Con el instante fijo la limpieza de presencia y la expiración de
+reservas los borrarían al arrancar la API, y /providers/nearby quedaría vacío en los bench.
+Contraseña de todas las cuentas: coinnet123.
+"""
+import argparse
+import asyncio
+import os
+import random
+import struct
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from pymongo import UpdateOne  # noqa: E402
+from database import connect_db, close_db, get_db  # noqa: E402
+from models.transaction import calculate_commission, to_storage, SCHEMA_VERSION  # noqa: E402
+from services.codes import encode_sequence  # noqa: E402
+from services.search import search_grams  # noqa: E402
+
+PASSWORD = "coinnet123"
+# bcrypt de PASSWORD con sal fija: hash_password usa una sal aleatoria y rompería el determinismo
+PASSWORD_HASH = "$2b$12$L.D05F6aA94iXKvCJwql2OXWxxzjGj4.U4mJhWR4Az/G38LQw9L9C"
+# Instante de referencia de todas las fechas: con él la misma semilla da los mismos documentos
+FIXED_NOW = datetime(2026, 1, 1)
+
+# (ciudad, lat, lng, peso relativo de negocios)
+CITIES = [
+    ("San José", 9.9281, -84.0907, 30),
+    ("Alajuela", 10.0163, -84.2116, 12),
+    ("Heredia", 9.9981, -84.1165, 10),
+    ("Cartago", 9.8644, -83.9194, 9),
+    ("Liberia", 10.6346, -85.4407, 6),
+    ("Puntarenas", 9.9763, -84.8384, 5),
+    ("Limón", 9.9907, -83.0360, 5),
+    ("Pérez Zeledón", 9.3737, -83.7030, 4),
+    ("San Carlos", 10.3238, -84.4271, 4),
+]
+FIRST_NAMES = ["Ana", "Luis", "María", "José", "Carlos", "Laura", "Diego", "Sofía", "Andrés", "Valeria", "Jorge", "Daniela"]
+LAST_NAMES = ["Rodríguez", "Vargas", "Jiménez", "Mora", "Rojas", "Solís", "Araya", "Castro", "Chaves", "Quesada"]
+BUSINESSES = ["Pulpería", "Soda", "Minisúper", "Farmacia", "Ferretería", "Librería", "Verdulería", "Panadería"]
+
+# Estado final -> probabilidad; los activos pesan poco como en producción
+STATUS_WEIGHTS = {
+    "completed": 70, "cancelled": 15, "disputed": 2, "requested": 3,
+    "accepted": 3, "sinpe_sent": 2, "proof_uploaded": 3, "verified": 2,
+}
+HAPPY_PATH = ["requested", "accepted", "sinpe_sent", "proof_uploaded", "verified", "completed"]
+RESERVED_STATUSES = {"accepted", "sinpe_sent", "proof_uploaded", "verified"}
+
+KIND_USER, KIND_PROVIDER, KIND_TX, KIND_EVENT = 1, 2, 3, 4
+
+
+def make_id(kind: int, n: int, epoch: datetime) -> ObjectId:
+    """_id determinista: segundos desde la época base + tipo + contador."""
+    ts = int(epoch.timestamp()) + n // 1000
+    return ObjectId(struct.pack(">IB", ts, kind) + n.to_bytes(7, "big"))
+
+
+def status_path(rng: random.Random, status: str) -> list:
+    if status in HAPPY_PATH:
+        return HAPPY_PATH[:HAPPY_PATH.index(status) + 1]
+    prefix = HAPPY_PATH[:rng.randint(1, 5 if status == "disputed" else 4)]
+    return prefix + [status]
+
+
+def gen_users(rng, n, n_providers, epoch, password_hash):
+    for i in range(n + n_providers + 1):
+        if i == n + n_providers:
+            email, account_type = "admin@seed.coinnet.test", "superadmin"
+        elif i >= n:
+            email, account_type = f"negocio{i - n}@seed.coinnet.test", "provider_business"
+        else:
+            email, account_type = f"usuario{i}@seed.coinnet.test", "user"
+        created = epoch + timedelta(minutes=i)
+        user = {
+            "_id": make_id(KIND_USER, i, epoch),
+            "email": email,
+            "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "phone": f"8{i:07d}",
+            "account_type": account_type,
+            "status": "active",
+            "password_hash": password_hash,
+            "reputation_score": round(rng.uniform(4.0, 5.0), 2),
+            "created_at": created,
+            "updated_at": created,
+        }
+        user["search_grams"] = search_grams(user, "users")
+        yield user
+
+
+def gen_providers(rng, n, n_users, epoch, live):
+    weights = [c[3] for c in CITIES]
+    for i in range(n):
+        city, lat, lng, _ = rng.choices(CITIES, weights=weights)[0]
+        lat, lng = lat + rng.gauss(0, 0.03), lng + rng.gauss(0, 0.03)
+        min_amount = rng.choice([1000, 2000, 5000])
+        declared = rng.choice([None, 50000, 100000, 250000, 500000])
+        available = rng.random() < 0.4
+        created = epoch + timedelta(hours=i)
+        provider = {
+            "_id": make_id(KIND_PROVIDER, i, epoch),
+            "user_id": str(make_id(KIND_USER, n_users + i, epoch)),
+            "business_name": f"{rng.choice(BUSINESSES)} {rng.choice(LAST_NAMES)} {i}",
+            "sinpe_number": f"6{i:07d}",
+            "sinpe_holder_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "bank_email": f"negocio{i}@seed.coinnet.test",
+            "address": f"{city}, {rng.randint(1, 500)} m de la iglesia",
+            "location": {"type": "Point", "coordinates": [round(lng, 6), round(lat, 6)]},
+            "verification_status": rng.choices(["active", "pending_review", "suspended"], weights=[85, 12, 3])[0],
+            "is_available": available,
+            "last_seen_at": live if available else live - timedelta(days=1),
+            "declared_liquidity": declared,
+            "reserved_liquidity": 0.0,
+            "available_liquidity": declared,
+            "min_amount": min_amount,
+            "max_amount": rng.choice([50000, 100000, 200000]),
+            "reputation_score": round(rng.uniform(3.5, 5.0), 2),
+            "created_at": created,
+            "updated_at": created,
+        }
+        provider["search_grams"] = search_grams(provider, "providers")
+        yield provider
+
+
+class TxGenerator:
+    def __init__(self, rng, n_users, n_providers, total, epoch, now, live, providers):
+        self.total = total
+        self.rng, self.n_users, self.n_providers = rng, n_users, n_providers
+        self.epoch, self.now, self.live, self.providers = epoch, now, live, providers
+        self.sequences = defaultdict(int)
+        self.event_n = 0
+        self.provider_stats = defaultdict(lambda: [0, 0.0, 0.0])
+        self.user_stats = defaultdict(int)
+        self.statuses, self.weights = list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values())
+
+    def make(self, i: int):
+        """Una transacción y sus eventos; acumula los contadores que le corresponden."""
+        rng = self.rng
+        user_id = str(make_id(KIND_USER, rng.randrange(self.n_users), self.epoch))
+        p_index = rng.randrange(self.n_providers)
+        provider = self.providers[p_index]
+        amount = float(rng.randrange(max(provider["min_amount"], 1000), provider["max_amount"] + 1, 500))
+        status = rng.choices(self.statuses, weights=self.weights)[0]
+        span = (self.now - self.epoch).total_seconds()
+        created = self.epoch + timedelta(seconds=span * i / max(self.total, 1))
+        period = created.strftime("%Y%m")
+        self.sequences[period] += 1
+        tx_id = make_id(KIND_TX, i, self.epoch)
+
+        path = status_path(rng, status)
+        ts, events, stamps = created, [], {}
+        for step in path:
+            events.append({
+                "_id": make_id(KIND_EVENT, self.event_n, self.epoch),
+                "tx_id": str(tx_id),
+                "status": step,
+                "actor": user_id if step in ("requested", "sinpe_sent", "proof_uploaded") else provider["user_id"],
+                "notes": "Generado por seed",
+                "ts": ts,
+            })
+            self.event_n += 1
+            stamps[step] = ts
+            ts += timedelta(seconds=rng.randint(20, 900))
+        if status == "accepted":
+            # Reserva abierta: aceptada ahora para que el barrido no la expire de inmediato
+            events[-1]["ts"] = stamps["accepted"] = max(self.live, stamps["accepted"])
+
+        tx = {
+            "_id": tx_id,
+            "v": SCHEMA_VERSION,
+            "transaction_code": f"CN-{period}-{encode_sequence(self.sequences[period])}",
+            "user_id": user_id,
+            "provider_id": str(provider["_id"]),
+            "status": status,
+            **calculate_commission(amount),
+            "provider_name": provider["business_name"],
+            "sinpe_number": provider["sinpe_number"],
+            "sinpe_holder_name": provider["sinpe_holder_name"],
+            "proof_s3_url": f"https://placeholder.coinnet.app/proofs/{tx_id}/proof.jpg" if "proof_uploaded" in stamps else None,
+            "proof_uploaded_at": stamps.get("proof_uploaded"),
+            "sinpe_sent_at": stamps.get("sinpe_sent"),
+            "verified_at": stamps.get("verified"),
+            "completed_at": stamps.get("completed"),
+            "cancelled_at": stamps.get("cancelled"),
+            "created_at": created,
+            "updated_at": events[-1]["ts"],
+        }
+        if "accepted" in stamps and status in RESERVED_STATUSES | {"disputed"}:
+            tx["reserved_amount"] = amount
+        if status == "disputed":
+            tx["dispute"] = {
+                "reason": "Generado por seed: el efectivo no fue entregado",
+                "opened_by": user_id, "opened_at": stamps["disputed"].isoformat(),
+            }
+
+        if status == "completed":
+            ps = self.provider_stats[p_index]
+            ps[0] += 1
+            ps[1] += amount
+            self.user_stats[user_id] += 1
+        if tx.get("reserved_amount"):
+            self.provider_stats[p_index][2] += amount
+        return to_storage(tx), events
+
+
+async def insert_batches(collection, docs, batch_size: int, label: str):
+    batch, total, start = [], 0, time.perf_counter()
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await collection.insert_many(batch, ordered=False)
+            total += len(batch)
+            batch = []
+            print(f"  {label}: {total:,} ({total / (time.perf_counter() - start):,.0f}/s)", end="\r")
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+        total += len(batch)
+    print(f"  {label}: {total:,} en {time.perf_counter() - start:.1f}s" + " " * 20)
+    return total
+
+
+async def run(args):
+    await connect_db()
+    db = get_db()
+    try:
+        if args.drop:
+            for name in ("users", "providers", "transactions", "transaction_events", "counters"):
+                await db[name].delete_many({})
+
+        rng = random.Random(args.seed)
+        live = datetime.utcnow().replace(microsecond=0)
+        now = live if args.relative_now else FIXED_NOW
+        epoch = now - timedelta(days=30 * args.months)
+        print("🌱 Generando datos con semilla", args.seed)
+
+        await insert_batches(db.users, gen_users(rng, args.users, args.providers, epoch, PASSWORD_HASH), args.batch_size, "usuarios")
+        providers = list(gen_providers(rng, args.providers, args.users, epoch, live))
+        await insert_batches(db.providers, iter(providers), args.batch_size, "proveedores")
+
+        gen = TxGenerator(rng, args.users, args.providers, args.transactions, epoch, now, live, providers)
+        events_buffer = []
+
+        def transactions():
+            for i in range(args.transactions):
+                tx, events = gen.make(i)
+                events_buffer.extend(events)
+                yield tx
+
+        # Los eventos se vuelcan por lotes mientras avanzan las transacciones
+        batch, total, start = [], 0, time.perf_counter()
+        for tx in transactions():
+            batch.append(tx)
+            if len(batch) >= args.batch_size:
+                await db.transactions.insert_many(batch, ordered=False)
+                await db.transaction_events.insert_many(events_buffer, ordered=False)
+                total += len(batch)
+                batch, events_buffer[:] = [], []
+                print(f"  transacciones: {total:,} ({total / (time.perf_counter() - start):,.0f}/s)", end="\r")
+        if batch:
+            await db.transactions.insert_many(batch, ordered=False)
+            await db.transaction_events.insert_many(events_buffer, ordered=False)
+            total += len(batch)
+        print(f"  transacciones: {total:,} en {time.perf_counter() - start:.1f}s" + " " * 20)
+
+        # Contadores coherentes con lo generado
+        ops = []
+        for p_index, (count, volume, reserved) in gen.provider_stats.items():
+            declared = providers[p_index]["declared_liquidity"]
+            ops.append(UpdateOne({"_id": providers[p_index]["_id"]}, {"$set": {
+                "total_transactions": count,
+                "total_volume": volume,
+                "reserved_liquidity": reserved,
+                "available_liquidity": None if declared is None else declared - reserved,
+            }}))
+        for start_i in range(0, len(ops), args.batch_size):
+            await db.providers.bulk_write(ops[start_i:start_i + args.batch_size], ordered=False)
+        ops = [UpdateOne({"_id": ObjectId(uid)}, {"$set": {"total_transactions": c}}) for uid, c in gen.user_stats.items()]
+        for start_i in range(0, len(ops), args.batch_size):
+            await db.users.bulk_write(ops[start_i:start_i + args.batch_size], ordered=False)
+        for period, seq in gen.sequences.items():
+            await db.counters.update_one({"_id": f"tx_code:{period}"}, {"$max": {"seq": seq}}, upsert=True)
+        print("✅ Listo")
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--providers", type=int, default=500)
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--months", type=int, default=12, help="antigüedad de la transacción más vieja")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--relative-now", action="store_true", help="fechas relativas a hoy en vez del instante fijo")
+    parser.add_argument("--drop", action="store_true", help="vaciar las colecciones antes de sembrar")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
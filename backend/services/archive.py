@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import gzip
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from bson import ObjectId, json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from pymongo import UpdateOne
+from config import get_settings
+from database import get_db, run_in_transaction
+from services.s3 import get_s3_client
+
+settings = get_settings()
+
+ARCHIVABLE_STATUSES = ["completed", "cancelled"]
+
+
+def encode_part(docs: list) -> bytes:
+    lines = "\n".join(json_util.dumps(d, json_options=RELAXED_JSON_OPTIONS) for d in docs)
+    return gzip.compress(lines.encode(), compresslevel=6)
+
+
+def decode_part(body: bytes) -> list:
+    return [json_util.loads(line) for line in gzip.decompress(body).decode().splitlines() if line]
+
+
+def put_part(s3, key: str, body: bytes, sha256: bytes):
+    # S3 valida el checksum al recibir y rechaza el objeto si no coincide
+    s3.put_object(
+        Bucket=settings.s3_bucket_name,
+        Key=key,
+        Body=body,
+        ContentType="application/x-ndjson",
+        ContentEncoding="gzip",
+        ChecksumSHA256=base64.b64encode(sha256).decode(),
+        Metadata={"sha256": sha256.hex()},
+    )
+
+
+def rollup_ops(txs: list) -> list:
+    totals = defaultdict(lambda: defaultdict(float))
+    for tx in txs:
+        for scope in ("global", f"provider:{tx['provider_id']}", f"user:{tx['user_id']}"):
+            t = totals[scope]
+            t["total"] += 1
+            t[tx["status"]] += 1
+            if tx["status"] == "completed":
+                t["completed_volume"] += tx["requested_amount"]
+                t["completed_commission"] += tx.get("commission_amount", 0)
+    return [UpdateOne({"_id": scope}, {"$inc": dict(values)}, upsert=True) for scope, values in totals.items()]
+
+
+async def _archive_chunk(s3, txs: list) -> int:
+    db = get_db()
+    ids = [tx["_id"] for tx in txs]
+    events = defaultdict(list)
+    async for e in db.transaction_events.find({"tx_id": {"$in": [str(i) for i in ids]}}).sort("ts", 1):
+        events[e["tx_id"]].append(e)
+    for tx in txs:
+        tx["events"] = events.get(str(tx["_id"]), [])
+
+    partitions = defaultdict(list)
+    for tx in txs:
+        partitions[tx["created_at"].strftime("%Y-%m-%d")].append(tx)
+
+    now = datetime.utcnow()
+    index_docs = []
+    for day, docs in partitions.items():
+        key = f"{settings.archive_prefix}/dt={day}/part-{ObjectId()}.ndjson.gz"
+        body = encode_part(docs)
+        sha256 = hashlib.sha256(body).digest()
+        await asyncio.to_thread(put_part, s3, key, body, sha256)
+        await db.archive_manifests.insert_one({
+            "key": key, "partition": day, "count": len(docs), "sha256": sha256.hex(),
+            "bytes": len(body), "created_at": now,
+        })
+        index_docs += [{
+            "_id": tx["_id"], "transaction_code": tx["transaction_code"], "user_id": tx["user_id"],
+            "provider_id": tx["provider_id"], "key": key, "archived_at": now,
+        } for tx in docs]
+
+    # Índice y rollups en la misma transacción: un corte no deja uno sin el otro, y en un
+    # reintento los ya indexados no vuelven a sumar
+    async def index_and_rollup(session):
+        done = {d["_id"] async for d in db.archived_transactions.find(
+            {"_id": {"$in": ids}}, {"_id": 1}, session=session
+        )}
+        fresh = [d for d in index_docs if d["_id"] not in done]
+        if fresh:
+            await db.archived_transactions.insert_many(fresh, session=session)
+        ops = rollup_ops([tx for tx in txs if tx["_id"] not in done])
+        if ops:
+            await db.archive_rollups.bulk_write(ops, ordered=False, session=session)
+
+    await run_in_transaction(index_and_rollup)
+
+    await db.transaction_events.delete_many({"tx_id": {"$in": [str(i) for i in ids]}})
+    result = await db.transactions.delete_many({"_id": {"$in": ids}, "status": {"$in": ARCHIVABLE_STATUSES}})
+    return result.deleted_count
+
+
+async def archive_transactions(older_than_days: int = None, batch_size: int = 1000) -> dict:
+    """Mueve a S3 las transacciones cerradas más viejas que el corte, por lotes."""
+    s3 = get_s3_client()
+    if not s3:
+        raise RuntimeError("S3 no está configurado; no hay dónde archivar")
+
+    db = get_db()
+    days = older_than_days if older_than_days is not None else settings.archive_after_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    cursor = db.transactions.find(
+        {"status": {"$in": ARCHIVABLE_STATUSES}, "updated_at": {"$lt": cutoff}}
+    ).batch_size(batch_size)
+
+    archived, chunk = 0, []
+    async for tx in cursor:
+        chunk.append(tx)
+        if len(chunk) >= batch_size:
+            archived += await _archive_chunk(s3, chunk)
+            chunk = []
+    if chunk:
+        archived += await _archive_chunk(s3, chunk)
+    return {"archived": archived, "cutoff": cutoff}
+
+
+async def find_archived(tx_id: str = None, code: str = None):
+    """Busca una transacción archivada y la lee de S3 bajo demanda."""
+    db = get_db()
+    query = {"_id": ObjectId(tx_id)} if tx_id else {"transaction_code": code}
+    entry = await db.archived_transactions.find_one(query)
+    s3 = get_s3_client()
+    if not entry or not s3:
+        return None
+    obj = await asyncio.to_thread(s3.get_object, Bucket=settings.s3_bucket_name, Key=entry["key"])
+    body = await asyncio.to_thread(obj["Body"].read)
+    for doc in decode_part(body):
+        if doc["_id"] == entry["_id"]:
+            doc["archived"] = True
+            return doc
+    return None
+
+
+async def archived_totals(scope: str = "global") -> dict:
+    db = get_db()
+    return await db.archive_rollups.find_one({"_id": scope}) or {}
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime
+from pymongo import ReturnDocument
+from database import get_db
+
+# Cada worker reserva un bloque de números con un solo $inc y los reparte en memoria
+BLOCK_SIZE = 50
+CODE_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CODE_LENGTH = 6
+
+
+def encode_sequence(n: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        n, rem = divmod(n, len(CODE_ALPHABET))
+        chars.append(CODE_ALPHABET[rem])
+    if n:
+        raise ValueError("Secuencia agotada para el periodo")
+    return "".join(reversed(chars))
+
+
+class CodeAllocator:
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        self.block_size = block_size
+        self._period = None
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _reserve_block(self, period: str):
+        db = get_db()
+        counter = await db.counters.find_one_and_update(
+            {"_id": f"tx_code:{period}"},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._period = period
+        self._end = counter["seq"]
+        self._next = self._end - self.block_size + 1
+
+    async def next_code(self) -> str:
+        period = datetime.utcnow().strftime("%Y%m")
+        async with self._lock:
+            if period != self._period or self._next > self._end:
+                await self._reserve_block(period)
+            seq = self._next
+            self._next += 1
+        return f"CN-{period}-{encode_sequence(seq)}"
+
+
+allocator = CodeAllocator()
+
+
+async def generate_code() -> str:
+    return await allocator.next_code()
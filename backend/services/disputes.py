@@ -0,0 +1,183 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from database import get_db, run_in_transaction
+from models.transaction import DisputeResolution, STORED_NAMES
+from services.events import record_events
+from services.liquidity import adjust_stage, REFRESH_AVAILABLE
+from services.notifications import notifications
+from services.state import invalidate
+
+# Prioridad de la cola: cada ₡10.000 en disputa suma un punto y cada día de espera otro,
+# así una disputa chica y vieja termina pasando a una grande y reciente en vez de esperar siempre
+AMOUNT_POINT = 10000
+AGE_POINT_HOURS = 24
+EPOCH = datetime(1970, 1, 1)
+
+
+def priority_expr(asof: datetime) -> dict:
+    age_hours = {"$divide": [{"$subtract": [asof, "$created_at"]}, 3600 * 1000]}
+    return {"$add": [
+        {"$divide": ["$requested_amount", AMOUNT_POINT]},
+        {"$divide": [age_hours, AGE_POINT_HOURS]},
+    ]}
+
+
+def encode_cursor(asof: datetime, tx: dict) -> str:
+    # La edad se mide siempre contra el mismo instante: si no, las prioridades se moverían entre páginas
+    return f"{(asof - EPOCH) // timedelta(milliseconds=1)}:{tx['priority']!r}:{tx['_id']}"
+
+
+def decode_cursor(cursor: str) -> tuple:
+    asof, priority, tx_id = cursor.split(":")
+    asof = EPOCH + timedelta(milliseconds=int(asof))
+    priority, oid = float(priority), ObjectId(tx_id)
+    return asof, {"$or": [
+        {"priority": {"$lt": priority}},
+        {"priority": priority, "_id": {"$gt": oid}},
+    ]}
+
+
+async def dispute_queue(limit: int = 50, cursor: str = None, min_amount: float = None,
+                        provider_id: str = None, user_id: str = None) -> dict:
+    """Disputas abiertas por prioridad (monto y antigüedad), paginadas por (prioridad, _id).
+
+    El filtro por estado usa el índice parcial `dispute_queue`; el puntaje se calcula sobre
+    las disputas abiertas, que son pocas comparadas con la colección.
+    """
+    db = get_db()
+    query = {"status": "disputed"}
+    if min_amount:
+        query["requested_amount"] = {"$gte": min_amount}
+    if provider_id:
+        query["provider_id"] = provider_id
+    if user_id:
+        query["user_id"] = user_id
+    if cursor:
+        asof, after = decode_cursor(cursor)
+    else:
+        # En milisegundos, que es lo que guarda el cursor y la precisión de las fechas en Mongo
+        now = datetime.utcnow()
+        asof, after = now.replace(microsecond=now.microsecond // 1000 * 1000), None
+
+    pipeline = [
+        {"$match": query},
+        {"$addFields": {"priority": priority_expr(asof)}},
+    ]
+    if after:
+        pipeline.append({"$match": after})
+    pipeline += [{"$sort": {"priority": -1, "_id": 1}}, {"$limit": limit}]
+    txs = await db.transactions.aggregate(pipeline).to_list(length=limit)
+    now = datetime.utcnow()
+    return {
+        "disputes": [{
+            "id": str(tx["_id"]),
+            "transaction_code": tx["transaction_code"],
+            "user_id": tx["user_id"],
+            "provider_id": tx["provider_id"],
+            "requested_amount": tx["requested_amount"],
+            "dispute": tx.get("dispute"),
+            "priority": round(tx["priority"], 2),
+            "age_hours": round((now - tx["created_at"]).total_seconds() / 3600, 1),
+            "created_at": tx["created_at"],
+        } for tx in txs],
+        "next_cursor": encode_cursor(asof, txs[-1]) if len(txs) == limit else None,
+    }
+
+
+def provider_counters(disputes: int, completed: int, volume: float, released: float,
+                      consumed: float, now: datetime) -> list:
+    """Pipeline de actualización: suma contadores, ajusta la liquidez reservada y
+    recalcula dispute_rate en la misma escritura."""
+    return [
+        adjust_stage(-(released + consumed), -consumed),
+        REFRESH_AVAILABLE,
+        {"$set": {
+            "total_disputes": {"$add": [{"$ifNull": ["$total_disputes", 0]}, disputes]},
+            "total_transactions": {"$add": [{"$ifNull": ["$total_transactions", 0]}, completed]},
+            "total_volume": {"$add": [{"$ifNull": ["$total_volume", 0]}, volume]},
+            "updated_at": now,
+        }},
+        {"$set": {
+            "dispute_rate": {"$divide": ["$total_disputes", {"$max": ["$total_transactions", "$total_disputes", 1]}]},
+        }},
+    ]
+
+
+def tally(resolved: list, completed: bool) -> tuple:
+    by_provider = defaultdict(lambda: [0, 0, 0.0, 0.0, 0.0])
+    by_user = defaultdict(lambda: [0, 0])
+    for tx in resolved:
+        p, u = by_provider[tx["provider_id"]], by_user[tx["user_id"]]
+        p[0] += 1
+        u[0] += 1
+        reserved = tx.get("reserved_amount") or 0
+        if completed:
+            p[1] += 1
+            p[2] += tx["requested_amount"]
+            p[4] += reserved
+            u[1] += 1
+        else:
+            p[3] += reserved
+    return by_provider, by_user
+
+
+async def resolve_disputes(tx_ids: list, data: DisputeResolution, admin_id: str) -> list:
+    db = get_db()
+    now = datetime.utcnow()
+    batch_id = str(ObjectId())
+    ids = [ObjectId(i) for i in tx_ids]
+
+    # Estado, eventos y contadores se confirman juntos: si algo falla a mitad, un reintento
+    # vuelve a encontrar las transacciones en disputa en vez de dejarlas sin contabilizar
+    async def bookkeeping(session):
+        # Solo transacciones que siguen en disputa; el batch_id identifica cuáles cambió esta llamada
+        await db.transactions.update_many(
+            {"_id": {"$in": ids}, "status": "disputed"},
+            {"$set": {
+                "status": data.final_status,
+                STORED_NAMES[f"{data.final_status}_at"]: now,
+                "dispute.resolved_at": now.isoformat(),
+                "dispute.resolution": data.resolution,
+                "dispute.admin_notes": data.notes,
+                "dispute.resolved_by": admin_id,
+                "dispute.batch_id": batch_id,
+                "updated_at": now,
+            }},
+            session=session,
+        )
+        resolved = await db.transactions.find(
+            {"_id": {"$in": ids}, "dispute.batch_id": batch_id}, session=session
+        ).to_list(length=len(ids))
+        if not resolved:
+            return []
+
+        await record_events([{
+            "tx_id": str(tx["_id"]),
+            "status": data.final_status,
+            "actor": admin_id,
+            "notes": f"Disputa resuelta: {data.resolution}",
+            "ts": now,
+        } for tx in resolved], session=session)
+
+        by_provider, by_user = tally(resolved, data.final_status == "completed")
+        await db.providers.bulk_write([
+            UpdateOne({"_id": ObjectId(pid)}, provider_counters(n, c, v, r, k, now))
+            for pid, (n, c, v, r, k) in by_provider.items()
+        ], ordered=False, session=session)
+        await db.users.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(uid)},
+                {"$inc": {"disputed_transactions": n, "total_transactions": c}, "$set": {"updated_at": now}}
+            )
+            for uid, (n, c) in by_user.items()
+        ], ordered=False, session=session)
+        return resolved
+
+    resolved = await run_in_transaction(bookkeeping)
+    for pid in {tx["provider_id"] for tx in resolved}:
+        await invalidate("provider", pid)
+    for tx in resolved:
+        await notifications.notify_transaction(tx, admin_id)
+    return resolved
@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from config import get_settings
+from database import get_db
+from services.state import shared_state, invalidate
+
+settings = get_settings()
+
+# Contadores denormalizados y de dónde salen: transacciones completadas vivas más las archivadas
+COUNTERS = {
+    "provider": {
+        "collection": "providers",
+        "field": "provider_id",
+        "counters": {"total_transactions": "count", "total_volume": "volume"},
+    },
+    "user": {
+        "collection": "users",
+        "field": "user_id",
+        "counters": {"total_transactions": "count"},
+    },
+}
+TOLERANCE = 0.01
+
+
+async def expected_counters(kind: str, ids: list) -> dict:
+    db = get_db()
+    spec = COUNTERS[kind]
+    expected = {i: {"count": 0, "volume": 0.0} for i in ids}
+    pipeline = [
+        {"$match": {spec["field"]: {"$in": ids}, "status": "completed"}},
+        {"$group": {"_id": f"${spec['field']}", "count": {"$sum": 1}, "volume": {"$sum": "$requested_amount"}}},
+    ]
+    async for row in db.transactions.aggregate(pipeline):
+        expected[row["_id"]] = {"count": row["count"], "volume": row["volume"]}
+    async for rollup in db.archive_rollups.find({"_id": {"$in": [f"{kind}:{i}" for i in ids]}}):
+        e = expected[rollup["_id"].split(":", 1)[1]]
+        e["count"] += int(rollup.get("completed", 0))
+        e["volume"] += rollup.get("completed_volume", 0.0)
+    return {
+        i: {counter: round(e[source], 2) if source == "volume" else e[source]
+            for counter, source in COUNTERS[kind]["counters"].items()}
+        for i, e in expected.items()
+    }
+
+
+def differs(observed: dict, expected: dict) -> bool:
+    return any(abs((observed.get(k) or 0) - v) > TOLERANCE for k, v in expected.items())
+
+
+async def scan(kind: str, batch_size: int = 500):
+    """Recorre la colección por _id y produce, por lote, los documentos con contadores desviados."""
+    db = get_db()
+    spec = COUNTERS[kind]
+    projection = {counter: 1 for counter in spec["counters"]}
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        docs = await db[spec["collection"]].find(query, projection).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            return
+        last_id = docs[-1]["_id"]
+        expected = await expected_counters(kind, [str(d["_id"]) for d in docs])
+        drifted = []
+        for doc in docs:
+            observed = {counter: doc.get(counter) for counter in spec["counters"]}
+            if differs(observed, expected[str(doc["_id"])]):
+                drifted.append((doc["_id"], observed, expected[str(doc["_id"])]))
+        yield len(docs), drifted
+
+
+async def repair(kind: str, drifted: list, confirm_delay: float) -> int:
+    """Corrige solo lo que sigue igual tras `confirm_delay` segundos.
+
+    Se recalcula lo esperado para no corregir con una foto tomada a mitad de un lote
+    de archivado, y el filtro sobre el valor observado descarta documentos que cambiaron
+    desde la lectura (una completación confirmada mueve estado y contador a la vez).
+    """
+    db = get_db()
+    spec = COUNTERS[kind]
+    await asyncio.sleep(confirm_delay)
+    confirmed = await expected_counters(kind, [str(oid) for oid, _, _ in drifted])
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne({"_id": oid, **observed}, {"$set": {**expected, "updated_at": now}})
+        for oid, observed, expected in drifted
+        if confirmed[str(oid)] == expected
+    ]
+    if not ops:
+        return 0
+    result = await db[spec["collection"]].bulk_write(ops, ordered=False)
+    if kind == "provider":
+        for oid, _, _ in drifted:
+            await invalidate("provider", str(oid))
+    return result.modified_count
+
+
+async def check_drift(fix: bool = False, batch_size: int = 500, confirm_delay: float = 5, sample: int = 20) -> dict:
+    report = {}
+    for kind in COUNTERS:
+        stats = {"checked": 0, "drifted": 0, "repaired": 0, "samples": []}
+        async for checked, drifted in scan(kind, batch_size):
+            stats["checked"] += checked
+            stats["drifted"] += len(drifted)
+            for oid, observed, expected in drifted[:max(0, sample - len(stats["samples"]))]:
+                stats["samples"].append({"id": str(oid), "observed": observed, "expected": expected})
+            if fix and drifted:
+                stats["repaired"] += await repair(kind, drifted, confirm_delay)
+        report[kind] = stats
+    return report
+
+
+class DriftDetector:
+    """Revisión periódica de contadores; con varios workers la corre solo quien toma el turno."""
+
+    def __init__(self):
+        self._task = None
+
+    async def _run(self):
+        interval = settings.drift_check_minutes * 60
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await shared_state.incr("coinnet:lock:drift_check", ttl=interval) != 1:
+                    continue
+                report = await check_drift(fix=True)
+                for kind, stats in report.items():
+                    if stats["drifted"]:
+                        print(f"⚠️ Contadores de {kind} desviados: {stats['drifted']} (corregidos {stats['repaired']})")
+            except PyMongoError as e:
+                print(f"⚠️ No se pudo revisar la desviación de contadores: {e}")
+
+    async def start(self):
+        if settings.drift_check_minutes > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+drift_detector = DriftDetector()
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from database import get_db
+
+
+def format_event(e: dict) -> dict:
+    return {
+        "id": str(e["_id"]),
+        "tx_id": e["tx_id"],
+        "status": e["status"],
+        "timestamp": e["ts"].isoformat(),
+        "actor": e["actor"],
+        "notes": e.get("notes", ""),
+    }
+
+
+async def record_event(tx_id: str, status: str, actor: str, notes: str = "", ts: datetime = None,
+                       session=None) -> dict:
+    db = get_db()
+    event = {
+        "tx_id": str(tx_id),
+        "status": status,
+        "actor": actor,
+        "notes": notes,
+        "ts": ts or datetime.utcnow(),
+    }
+    result = await db.transaction_events.insert_one(event, session=session)
+    event["_id"] = result.inserted_id
+    return event
+
+
+def merge_timeline(events: list, legacy: list) -> list:
+    """Une el timeline embebido de transacciones anteriores al log con los eventos nuevos.
+
+    Una transacción creada antes del log sigue recibiendo eventos en la colección, así que
+    ninguna de las dos fuentes está completa por sí sola.
+    """
+    if not legacy:
+        return events
+    return sorted(legacy + events, key=lambda e: datetime.fromisoformat(e["timestamp"]))
+
+
+async def list_events(tx: dict) -> list:
+    db = get_db()
+    cursor = db.transaction_events.find({"tx_id": str(tx["_id"])}).sort("ts", 1)
+    events = [format_event(e) for e in await cursor.to_list(length=None)]
+    return merge_timeline(events, tx.get("timeline", []))
+
+
+# Los _id los genera cada worker al insertar: uno menor puede confirmarse después de otro mayor.
+# La lectura se queda este margen por detrás del presente: el límite de vida de una transacción
+# de Mongo (60 s por defecto, las completaciones y disputas insertan eventos dentro de una) más
+# el desfase de relojes entre workers. Así ningún evento se confirma detrás del cursor.
+STREAM_SETTLE = timedelta(seconds=90)
+
+
+async def stream_events(after: str = None, limit: int = 500) -> list:
+    """Lectura del log en orden de inserción, reanudable desde el último id recibido.
+
+    Solo entrega eventos con más de STREAM_SETTLE de antigüedad; los más nuevos llegan
+    en la siguiente lectura.
+    """
+    db = get_db()
+    horizon = ObjectId.from_datetime(datetime.utcnow() - STREAM_SETTLE)
+    query = {"_id": {"$lt": horizon}}
+    if after:
+        query["_id"]["$gt"] = ObjectId(after)
+    cursor = db.transaction_events.find(query).sort("_id", 1).limit(limit)
+    return [format_event(e) for e in await cursor.to_list(length=limit)]
+
+
+async def record_events(events: list, session=None):
+    if events:
+        db = get_db()
+        await db.transaction_events.insert_many(events, session=session)
@@ -0,0 +1,100 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+# Memoria por bloque en k_nearest_many; haversine_np mantiene varios temporales del tamaño de la matriz
+CHUNK_MEMORY_BYTES = 256 * 1024 * 1024
+MATRIX_TEMPORARIES = 6
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = EARTH_RADIUS_KM
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """Haversine sobre arreglos con broadcasting de NumPy; devuelve km."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def distance_matrix(lats1, lngs1, lats2, lngs2):
+    """Matriz (n, m) de distancias entre dos conjuntos de puntos."""
+    lats1, lngs1 = np.asarray(lats1)[:, None], np.asarray(lngs1)[:, None]
+    return haversine_np(lats1, lngs1, np.asarray(lats2)[None, :], np.asarray(lngs2)[None, :])
+
+
+def k_nearest(lat, lng, lats, lngs, k: int):
+    """Índices y distancias de los k puntos más cercanos a (lat, lng), ordenados."""
+    dists = haversine_np(lat, lng, lats, lngs)
+    k = min(k, dists.size)
+    if k == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+    idx = np.argpartition(dists, k - 1)[:k]
+    idx = idx[np.argsort(dists[idx])]
+    return idx, dists[idx]
+
+
+def chunk_rows(points: int, memory_bytes: int = CHUNK_MEMORY_BYTES) -> int:
+    """Filas de consulta por bloque para que la matriz (filas, points) y sus temporales quepan."""
+    return max(1, memory_bytes // (max(1, points) * 8 * MATRIX_TEMPORARIES))
+
+
+def k_nearest_many(qlats, qlngs, lats, lngs, k: int, memory_bytes: int = CHUNK_MEMORY_BYTES):
+    """k vecinos para muchas consultas, por bloques para acotar la memoria de la matriz.
+
+    El tamaño del bloque sale de la cantidad de puntos: con 1M de puntos son unas pocas
+    filas por bloque en vez de una matriz de varios GB.
+    """
+    qlats, qlngs = np.asarray(qlats), np.asarray(qlngs)
+    k = min(k, len(lats))
+    all_idx = np.empty((len(qlats), k), dtype=np.intp)
+    all_dist = np.empty((len(qlats), k))
+    if k == 0:
+        return all_idx, all_dist
+    chunk = chunk_rows(len(lats), memory_bytes)
+    for start in range(0, len(qlats), chunk):
+        stop = start + chunk
+        dists = distance_matrix(qlats[start:stop], qlngs[start:stop], lats, lngs)
+        idx = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        part = np.take_along_axis(dists, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        all_idx[start:stop] = np.take_along_axis(idx, order, axis=1)
+        all_dist[start:stop] = np.take_along_axis(part, order, axis=1)
+    return all_idx, all_dist
+
+
+def coverage_grid(lats, lngs, bounds, cell_km: float = 1.0):
+    """Mapa de cobertura sobre una grilla regular.
+
+    `bounds` es (lat_min, lng_min, lat_max, lng_max). Devuelve los centros de cada celda,
+    la cantidad de puntos por celda y la distancia del centro al punto más cercano.
+    """
+    lat_min, lng_min, lat_max, lng_max = bounds
+    lat_step = cell_km / 111.32
+    lng_step = cell_km / (111.32 * math.cos(math.radians((lat_min + lat_max) / 2)))
+    lat_edges = np.arange(lat_min, lat_max + lat_step, lat_step)
+    lng_edges = np.arange(lng_min, lng_max + lng_step, lng_step)
+
+    counts, _, _ = np.histogram2d(lats, lngs, bins=[lat_edges, lng_edges])
+    center_lats = (lat_edges[:-1] + lat_edges[1:]) / 2
+    center_lngs = (lng_edges[:-1] + lng_edges[1:]) / 2
+    grid_lats, grid_lngs = np.meshgrid(center_lats, center_lngs, indexing="ij")
+
+    if len(lats):
+        _, nearest = k_nearest_many(grid_lats.ravel(), grid_lngs.ravel(), np.asarray(lats), np.asarray(lngs), 1)
+        nearest_km = nearest[:, 0].reshape(grid_lats.shape)
+    else:
+        nearest_km = np.full(grid_lats.shape, np.inf)
+    return {
+        "lat_centers": center_lats,
+        "lng_centers": center_lngs,
+        "counts": counts.astype(np.int64),
+        "nearest_km": nearest_km,
+    }
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from config import get_settings
+from database import ping_db
+from services.s3 import get_s3_client
+
+settings = get_settings()
+
+
+class HealthChecker:
+    """Chequeos de dependencias con timeout corto y resultado cacheado unos segundos.
+
+    Así una ráfaga de sondas (varias réplicas, el balanceador y monitoreo) no se convierte
+    en una ráfaga de pings a Mongo y S3.
+    """
+
+    def __init__(self):
+        self._cached = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._s3 = None
+
+    async def _timed(self, check) -> dict:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), settings.health_timeout_seconds)
+            ok, error = True, None
+        except asyncio.TimeoutError:
+            ok, error = False, "timeout"
+        except Exception as e:
+            ok, error = False, str(e)[:200]
+        result = {"ok": ok, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+        if error:
+            result["error"] = error
+        return result
+
+    async def _check_s3(self):
+        if self._s3 is None:
+            self._s3 = get_s3_client()
+        await asyncio.to_thread(self._s3.head_bucket, Bucket=settings.s3_bucket_name)
+
+    async def dependencies(self) -> dict:
+        async with self._lock:
+            if self._cached and time.monotonic() - self._checked_at < settings.health_cache_seconds:
+                return self._cached
+            checks = {"mongodb": self._timed(ping_db)}
+            if settings.health_check_s3 and settings.aws_access_key_id:
+                checks["s3"] = self._timed(self._check_s3)
+            results = await asyncio.gather(*checks.values())
+            self._cached = dict(zip(checks, results))
+            self._checked_at = time.monotonic()
+            return self._cached
+
+
+health_checker = HealthChecker()
@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from config import get_settings
+from database import get_db
+from models.transaction import to_storage
+from services.events import record_event
+from services.pending import pending_projection
+from services.notifications import notifications
+from services.state import invalidate
+
+settings = get_settings()
+
+# Sin liquidez declarada no hay límite; si no, lo declarado menos lo reservado
+AVAILABLE_EXPR = {"$cond": [
+    {"$eq": [{"$ifNull": ["$declared_liquidity", None]}, None]},
+    None,
+    {"$subtract": ["$declared_liquidity", {"$ifNull": ["$reserved_liquidity", 0]}]},
+]}
+REFRESH_AVAILABLE = {"$set": {"available_liquidity": AVAILABLE_EXPR}}
+
+
+def adjust_stage(reserved_delta: float = 0, declared_delta: float = 0) -> dict:
+    """Etapa de pipeline que mueve reservado/declarado sin bajar de cero."""
+    stage = {"reserved_liquidity": {"$max": [0, {"$add": [{"$ifNull": ["$reserved_liquidity", 0]}, reserved_delta]}]}}
+    if declared_delta:
+        stage["declared_liquidity"] = {"$cond": [
+            {"$eq": [{"$ifNull": ["$declared_liquidity", None]}, None]},
+            None,
+            {"$max": [0, {"$add": ["$declared_liquidity", declared_delta]}]},
+        ]}
+    return {"$set": stage}
+
+
+async def reserve(provider_id: str, amount: float) -> bool:
+    """Reserva `amount` solo si el proveedor aún tiene esa liquidez libre."""
+    db = get_db()
+    result = await db.providers.update_one(
+        {
+            "_id": ObjectId(provider_id),
+            "$expr": {"$or": [
+                {"$eq": [{"$ifNull": ["$declared_liquidity", None]}, None]},
+                {"$gte": [AVAILABLE_EXPR, amount]},
+            ]},
+        },
+        [adjust_stage(amount), REFRESH_AVAILABLE, {"$set": {"updated_at": datetime.utcnow()}}]
+    )
+    if result.modified_count != 1:
+        return False
+    await invalidate("provider", provider_id)
+    return True
+
+
+async def release(provider_id: str, amount: float):
+    db = get_db()
+    await db.providers.update_one(
+        {"_id": ObjectId(provider_id)},
+        [adjust_stage(-amount), REFRESH_AVAILABLE, {"$set": {"updated_at": datetime.utcnow()}}]
+    )
+    await invalidate("provider", provider_id)
+
+
+async def consume(provider_id: str, amount: float, session=None):
+    """Al completar, el efectivo reservado sale de la liquidez declarada.
+
+    Dentro de una transacción la invalidación queda a cargo de quien hace el commit.
+    """
+    db = get_db()
+    await db.providers.update_one(
+        {"_id": ObjectId(provider_id)},
+        [adjust_stage(-amount, -amount), REFRESH_AVAILABLE, {"$set": {"updated_at": datetime.utcnow()}}],
+        session=session,
+    )
+    if session is None:
+        await invalidate("provider", provider_id)
+
+
+async def refresh_available(provider_id: str):
+    db = get_db()
+    await db.providers.update_one({"_id": ObjectId(provider_id)}, [REFRESH_AVAILABLE])
+
+
+async def backfill_available() -> int:
+    """Calcula `available_liquidity` en proveedores anteriores a las reservas.
+
+    Sin el campo, la búsqueda y la creación de solicitudes los tratarían como sin límite.
+    """
+    db = get_db()
+    result = await db.providers.update_many({"available_liquidity": {"$exists": False}}, [REFRESH_AVAILABLE])
+    return result.modified_count
+
+
+async def expire_reservations():
+    """Cancela solicitudes aceptadas que no avanzaron dentro del plazo y libera su reserva."""
+    db = get_db()
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.reservation_ttl_minutes)
+    stale = db.transactions.find({"status": "accepted", "updated_at": {"$lt": cutoff}}, {"_id": 1})
+    async for candidate in stale:
+        now = datetime.utcnow()
+        tx = await db.transactions.find_one_and_update(
+            {"_id": candidate["_id"], "status": "accepted", "updated_at": {"$lt": cutoff}},
+            {"$set": to_storage({"status": "cancelled", "cancelled_at": now, "updated_at": now})},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not tx:
+            continue
+        await record_event(tx["_id"], "cancelled", "system", "Reserva expirada", now)
+        if tx.get("reserved_amount"):
+            await release(tx["provider_id"], tx["reserved_amount"])
+        await pending_projection.announce(tx)
+        await notifications.notify_transaction(tx, "system")
+
+
+class ReservationSweeper:
+    def __init__(self):
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(60)
+            try:
+                await expire_reservations()
+            except PyMongoError as e:
+                print(f"⚠️ No se pudieron expirar reservas: {e}")
+
+    async def start(self):
+        backfilled = await backfill_available()
+        if backfilled:
+            print(f"✅ Liquidez disponible calculada para {backfilled} proveedores")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reservation_sweeper = ReservationSweeper()
@@ -0,0 +1,304 @@
+import asyncio
+import json
+import smtplib
+import time
+from collections import deque
+from email.message import EmailMessage
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from config import get_settings
+from database import get_db
+from services.presence import presence
+
+settings = get_settings()
+
+STATUS_MESSAGES = {
+    "requested": ("Nueva solicitud", "Te pidieron ₡{amount:,.0f} en efectivo"),
+    "accepted": ("Solicitud aceptada", "El negocio aceptó tu solicitud {code}. Envía el SINPE."),
+    "sinpe_sent": ("SINPE enviado", "El usuario marcó como enviado el SINPE de {code}"),
+    "proof_uploaded": ("Comprobante recibido", "Revisa el comprobante de {code}"),
+    "verified": ("SINPE verificado", "El negocio verificó tu SINPE. Pasa por el efectivo."),
+    "completed": ("Transacción completada", "La transacción {code} se completó"),
+    "cancelled": ("Transacción cancelada", "La transacción {code} fue cancelada"),
+    "disputed": ("Disputa abierta", "Se abrió una disputa sobre {code}"),
+}
+
+# El correo solo para avisos que no deberían perderse si el navegador está cerrado
+EMAIL_STATUSES = {"requested", "disputed"}
+
+LATENCY_SAMPLES = 1000
+
+
+def transaction_message(tx: dict) -> dict:
+    title, body = STATUS_MESSAGES[tx["status"]]
+    return {
+        "tx_id": str(tx["_id"]),
+        "status": tx["status"],
+        "title": title,
+        "body": body.format(amount=tx["requested_amount"], code=tx["transaction_code"]),
+        "created": time.monotonic(),
+    }
+
+
+def summarize(messages: list) -> dict:
+    """Un solo aviso por ráfaga: el último estado y cuántos cambios agrupa."""
+    latest = messages[-1]
+    summary = {"tx_id": latest["tx_id"], "status": latest["status"], "title": latest["title"], "body": latest["body"]}
+    if len(messages) > 1:
+        summary["title"] = f"{len(messages)} actualizaciones"
+        summary["count"] = len(messages)
+    return summary
+
+
+class PartialDelivery(Exception):
+    """Algunos destinos del canal fallaron; el reintento va solo a `remaining`."""
+
+    def __init__(self, remaining: list, error: Exception):
+        super().__init__(str(error))
+        self.remaining = remaining
+
+
+class LocalChannel:
+    """Guarda las entregas en memoria; sustituye a los canales reales en desarrollo y pruebas."""
+
+    name = "local"
+
+    def __init__(self):
+        self.delivered = deque(maxlen=LATENCY_SAMPLES)
+
+    def wants(self, messages: list) -> bool:
+        return True
+
+    async def send(self, user_id: str, messages: list, targets: list = None):
+        self.delivered.append({"user_id": user_id, **summarize(messages)})
+
+
+class WebPushChannel:
+    """Web Push a las suscripciones de la PWA guardadas en `push_subscriptions`."""
+
+    name = "webpush"
+
+    def __init__(self):
+        from pywebpush import webpush, WebPushException
+
+        self._webpush = webpush
+        self._error = WebPushException
+
+    def wants(self, messages: list) -> bool:
+        return True
+
+    def _push(self, subscription: dict, payload: str):
+        self._webpush(
+            subscription_info={"endpoint": subscription["endpoint"], "keys": subscription["keys"]},
+            data=payload,
+            vapid_private_key=settings.vapid_private_key,
+            vapid_claims={"sub": settings.vapid_subject},
+            ttl=300,
+        )
+
+    async def send(self, user_id: str, messages: list, targets: list = None):
+        """`targets` son las suscripciones que fallaron en el intento anterior."""
+        db = get_db()
+        payload = json.dumps(summarize(messages))
+        if targets is None:
+            targets = await db.push_subscriptions.find({"user_id": user_id}).to_list(length=20)
+        failed, error = [], None
+        for subscription in targets:
+            try:
+                await asyncio.to_thread(self._push, subscription, payload)
+            except self._error as e:
+                # 404/410: el navegador dio de baja la suscripción
+                if e.response is not None and e.response.status_code in (404, 410):
+                    await db.push_subscriptions.delete_one({"_id": subscription["_id"]})
+                else:
+                    failed.append(subscription)
+                    error = e
+        if failed:
+            raise PartialDelivery(failed, error)
+
+
+class EmailChannel:
+    name = "email"
+
+    def wants(self, messages: list) -> bool:
+        return any(m["status"] in EMAIL_STATUSES for m in messages)
+
+    def _send_smtp(self, to: str, subject: str, body: str):
+        msg = EmailMessage()
+        msg["From"] = settings.smtp_from
+        msg["To"] = to
+        msg["Subject"] = subject
+        msg.set_content(body)
+        with smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=10) as smtp:
+            smtp.starttls()
+            if settings.smtp_user:
+                smtp.login(settings.smtp_user, settings.smtp_password)
+            smtp.send_message(msg)
+
+    async def send(self, user_id: str, messages: list, targets: list = None):
+        db = get_db()
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, {"email": 1})
+        if not user:
+            return
+        selected = [m for m in messages if m["status"] in EMAIL_STATUSES]
+        body = "\n".join(m["body"] for m in selected)
+        await asyncio.to_thread(self._send_smtp, user["email"], f"Coinnet: {selected[-1]['title']}", body)
+
+
+def configured_channels() -> list:
+    """Canales reales según la configuración; sin ninguno, el local para desarrollo."""
+    channels = []
+    if settings.vapid_private_key:
+        try:
+            channels.append(WebPushChannel())
+        except ImportError:
+            print("⚠️ VAPID configurado pero pywebpush no está instalado; Web Push desactivado")
+    if settings.smtp_host:
+        channels.append(EmailChannel())
+    return channels or [LocalChannel()]
+
+
+class NotificationService:
+    """Avisos de cambios de estado a los participantes de una transacción.
+
+    Los avisos de un mismo destinatario que llegan dentro de la ventana de agrupación
+    se entregan juntos; cada canal se reintenta por separado con espera exponencial.
+    """
+
+    def __init__(self, channels: list = None):
+        self.channels = channels or []
+        self._pending = {}
+        self._queue = asyncio.Queue()
+        self._workers = []
+        self._latency = {}
+        self._counters = {}
+
+    def notify(self, user_id: str, message: dict):
+        """No bloquea la petición: encola el aviso y programa su entrega."""
+        if not self._workers:
+            return
+        batch = self._pending.get(user_id)
+        if batch is None:
+            self._pending[user_id] = [message]
+            asyncio.get_running_loop().call_later(
+                settings.notification_coalesce_ms / 1000, self._queue.put_nowait, user_id
+            )
+        else:
+            batch.append(message)
+
+    async def notify_transaction(self, tx: dict, actor: str):
+        """Avisa del estado actual de `tx` a los participantes que no hicieron el cambio."""
+        if tx["status"] not in STATUS_MESSAGES:
+            return
+        recipients = {tx["user_id"]}
+        owner = await self._provider_owner(tx["provider_id"])
+        if owner:
+            recipients.add(owner)
+        message = transaction_message(tx)
+        for user_id in recipients - {actor}:
+            self.notify(user_id, message)
+
+    async def _provider_owner(self, provider_id: str):
+        owner = presence.owner(provider_id)
+        if owner is None:
+            try:
+                provider = await get_db().providers.find_one({"_id": ObjectId(provider_id)}, {"user_id": 1})
+            except PyMongoError as e:
+                print(f"⚠️ No se pudo resolver el dueño del proveedor {provider_id}: {e}")
+                return None
+            if provider:
+                owner = provider["user_id"]
+                presence.remember_owner(provider_id, owner)
+        return owner
+
+    def _count(self, channel: str, key: str):
+        counters = self._counters.setdefault(channel, {"sent": 0, "failed": 0, "retries": 0})
+        counters[key] += 1
+
+    async def _deliver(self, channel, user_id: str, messages: list):
+        targets = None
+        for attempt in range(settings.notification_retries + 1):
+            try:
+                await channel.send(user_id, messages, targets)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, PartialDelivery):
+                    targets = e.remaining
+                if attempt == settings.notification_retries:
+                    self._count(channel.name, "failed")
+                    print(f"⚠️ Aviso por {channel.name} a {user_id} falló: {e}")
+                    return
+                self._count(channel.name, "retries")
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                continue
+            self._count(channel.name, "sent")
+            # Latencia desde el cambio de estado más antiguo del grupo
+            samples = self._latency.setdefault(channel.name, deque(maxlen=LATENCY_SAMPLES))
+            samples.append(time.monotonic() - messages[0]["created"])
+            return
+
+    async def _work(self):
+        while True:
+            user_id = await self._queue.get()
+            try:
+                messages = self._pending.pop(user_id, None)
+                if messages:
+                    await asyncio.gather(*(
+                        self._deliver(channel, user_id, messages)
+                        for channel in self.channels if channel.wants(messages)
+                    ))
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        result = {}
+        for channel in self.channels:
+            samples = sorted(self._latency.get(channel.name, []))
+
+            def pct(p):
+                return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 1) if samples else None
+
+            result[channel.name] = {
+                **self._counters.get(channel.name, {"sent": 0, "failed": 0, "retries": 0}),
+                "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "samples": len(samples)},
+            }
+        return {"channels": result, "pending_recipients": len(self._pending)}
+
+    async def start(self):
+        if not self.channels:
+            self.channels = configured_channels()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(settings.notification_workers)]
+
+    async def drain(self, timeout: float) -> bool:
+        """Entrega lo pendiente sin esperar la ventana de agrupación, con un tope de tiempo.
+
+        Los `call_later` ya programados encolan después a un destinatario sin avisos,
+        que el worker descarta.
+        """
+        if not self._workers:
+            return True
+        for user_id in list(self._pending):
+            self._queue.put_nowait(user_id)
+        if timeout <= 0:
+            # Presupuesto agotado: un instante para lo que ya está en vuelo, no para reintentos
+            timeout = 0.5
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            print(f"⚠️ Quedaron {len(self._pending)} avisos sin entregar al apagar")
+            return False
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+
+notifications = NotificationService()
@@ -0,0 +1,150 @@
+import asyncio
+from pymongo.errors import OperationFailure, PyMongoError
+from bson import ObjectId
+from database import get_db
+from services.state import invalidate, on_invalidate, on_resync
+
+ACTIVE_STATUSES = ["requested", "accepted", "sinpe_sent", "proof_uploaded"]
+
+# Códigos de Mongo: change streams no soportados (standalone) y resume token fuera del oplog
+CHANGE_STREAMS_UNSUPPORTED = {40573}
+HISTORY_LOST = {136, 280, 286}
+
+
+class PendingProjection:
+    """Transacciones activas por proveedor, mantenidas en memoria.
+
+    Se alimenta de change streams de `transactions`; si el servidor no los soporta,
+    de los cambios que anuncian las rutas de este y los demás workers (`announce`).
+    """
+
+    def __init__(self):
+        self.mode = "bus"
+        self.ready = False
+        self._by_provider = {}
+        self._owner = {}
+        self._resume_token = None
+        self._task = None
+        self._listeners = []
+
+    def subscribe(self, handler):
+        """`handler(tx)` recibe cada cambio aceptado, local o de otro worker."""
+        self._listeners.append(handler)
+
+    def publish(self, tx: dict):
+        tx_id = str(tx["_id"])
+        current_provider = self._owner.get(tx_id)
+        if current_provider:
+            current = self._by_provider.get(current_provider, {}).get(tx_id)
+            # Un evento atrasado del stream no debe pisar un estado más nuevo
+            if current and current["updated_at"] > tx["updated_at"]:
+                return
+        for handler in self._listeners:
+            handler(tx)
+        if tx["status"] in ACTIVE_STATUSES:
+            self._by_provider.setdefault(tx["provider_id"], {})[tx_id] = tx
+            self._owner[tx_id] = tx["provider_id"]
+        else:
+            self._discard(tx_id)
+
+    async def announce(self, tx: dict):
+        """Aplica el cambio local y, sin change streams, lo avisa a los demás workers."""
+        self.publish(tx)
+        if self.mode == "bus":
+            await invalidate("transaction", str(tx["_id"]), local=False)
+
+    async def _reload(self, tx_id: str):
+        if self.mode != "bus":
+            return
+        tx = await get_db().transactions.find_one({"_id": ObjectId(tx_id)})
+        if tx:
+            self.publish(tx)
+        else:
+            self._discard(tx_id)
+
+    def _discard(self, tx_id: str):
+        provider_id = self._owner.pop(tx_id, None)
+        if provider_id:
+            self._by_provider.get(provider_id, {}).pop(tx_id, None)
+
+    def get(self, provider_id: str, limit: int = 50) -> list:
+        txs = sorted(self._by_provider.get(provider_id, {}).values(), key=lambda t: t["created_at"], reverse=True)
+        return txs[:limit]
+
+    async def resync(self):
+        db = get_db()
+        by_provider, owner = {}, {}
+        async for tx in db.transactions.find({"status": {"$in": ACTIVE_STATUSES}}):
+            tx_id = str(tx["_id"])
+            by_provider.setdefault(tx["provider_id"], {})[tx_id] = tx
+            owner[tx_id] = tx["provider_id"]
+        self._by_provider, self._owner = by_provider, owner
+        self.ready = True
+
+    def _apply_change(self, change: dict):
+        if change["operationType"] == "delete":
+            self._discard(str(change["documentKey"]["_id"]))
+        elif change.get("fullDocument"):
+            self.publish(change["fullDocument"])
+        else:
+            # El documento ya no existe al hacer el lookup
+            self._discard(str(change["documentKey"]["_id"]))
+
+    async def _watch(self):
+        db = get_db()
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        delay = 1
+        while True:
+            try:
+                async with db.transactions.watch(
+                    pipeline, full_document="updateLookup", resume_after=self._resume_token
+                ) as stream:
+                    self.mode = "change_stream"
+                    if self._resume_token is None:
+                        # Abrir el stream antes del snapshot para no perder cambios intermedios
+                        change = await stream.try_next()
+                        await self.resync()
+                        if change:
+                            self._apply_change(change)
+                        self._resume_token = stream.resume_token
+                    delay = 1
+                    async for change in stream:
+                        self._apply_change(change)
+                        self._resume_token = stream.resume_token
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    self.mode = "bus"
+                    print("⚠️ Change streams no disponibles, proyección en modo bus")
+                    return
+                if e.code in HISTORY_LOST:
+                    self._resume_token = None
+                    continue
+                print(f"⚠️ Change stream de transacciones falló: {e}")
+            except PyMongoError as e:
+                print(f"⚠️ Change stream de transacciones falló: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def _resync_bus(self):
+        if self.mode == "bus":
+            await self.resync()
+
+    async def start(self):
+        on_invalidate("transaction", self._reload)
+        on_resync(self._resync_bus)
+        await self.resync()
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+pending_projection = PendingProjection()
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from config import get_settings
+from database import get_db
+from services.state import invalidate
+
+settings = get_settings()
+
+
+class PresenceTable:
+    """Último heartbeat de cada proveedor, en memoria y volcado a Mongo por lotes."""
+
+    def __init__(self):
+        self._last_seen = {}
+        self._dirty = set()
+        self._owners = {}
+        self._task = None
+
+    @property
+    def ttl(self) -> timedelta:
+        return timedelta(seconds=settings.presence_ttl_seconds)
+
+    def owner(self, provider_id: str):
+        return self._owners.get(provider_id)
+
+    def remember_owner(self, provider_id: str, user_id: str):
+        self._owners[provider_id] = user_id
+
+    def beat(self, provider_id: str, at: datetime = None):
+        self._last_seen[provider_id] = at or datetime.utcnow()
+        self._dirty.add(provider_id)
+
+    def last_seen(self, provider_id: str):
+        return self._last_seen.get(provider_id)
+
+    def is_stale(self, provider: dict) -> bool:
+        seen = [t for t in (provider.get("last_seen_at"), self.last_seen(str(provider["_id"]))) if t]
+        return not seen or max(seen) < datetime.utcnow() - self.ttl
+
+    def freshness_filter(self) -> dict:
+        return {"last_seen_at": {"$gte": datetime.utcnow() - self.ttl}}
+
+    async def flush(self):
+        db = get_db()
+        dirty, self._dirty = self._dirty, set()
+        if dirty:
+            # $max evita que un worker con un latido más viejo retroceda la marca
+            ops = [
+                UpdateOne({"_id": ObjectId(pid)}, {"$max": {"last_seen_at": self._last_seen[pid]}})
+                for pid in dirty
+            ]
+            try:
+                await db.providers.bulk_write(ops, ordered=False)
+            except PyMongoError:
+                self._dirty |= dirty
+                raise
+
+        cutoff = datetime.utcnow() - self.ttl
+        stale_filter = {
+            "is_available": True,
+            "$or": [{"last_seen_at": {"$lt": cutoff}}, {"last_seen_at": {"$exists": False}}],
+        }
+        stale = [doc["_id"] async for doc in db.providers.find(stale_filter, {"_id": 1})]
+        if stale:
+            # El filtro se repite: un latido entre la lectura y la escritura los mantiene encendidos
+            await db.providers.update_many(
+                {"_id": {"$in": stale}, **stale_filter},
+                {"$set": {"is_available": False, "updated_at": datetime.utcnow()}}
+            )
+            # Cachés de otros workers y el índice en memoria los siguen mostrando hasta invalidarlos
+            for oid in stale:
+                await invalidate("provider", str(oid))
+        for pid, seen in list(self._last_seen.items()):
+            if seen < cutoff and pid not in self._dirty:
+                del self._last_seen[pid]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.presence_flush_seconds)
+            try:
+                await self.flush()
+            except PyMongoError as e:
+                print(f"⚠️ No se pudo volcar presencia de proveedores: {e}")
+
+    async def backfill(self):
+        """Da un TTL de gracia a proveedores disponibles que nunca enviaron latido.
+
+        Sin esto el primer volcado los apagaría a todos antes de que alcancen a latir.
+        """
+        now = datetime.utcnow()
+        result = await get_db().providers.update_many(
+            {"is_available": True, "last_seen_at": {"$exists": False}},
+            {"$set": {"last_seen_at": now}},
+        )
+        if result.modified_count:
+            print(f"✅ {result.modified_count} proveedores sin latido previo reciben un TTL de gracia")
+
+    async def start(self):
+        await self.backfill()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except PyMongoError:
+            pass
+
+
+presence = PresenceTable()
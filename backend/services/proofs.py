@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import io
+from datetime import datetime
+from pymongo.errors import PyMongoError
+from database import get_db
+
+# dHash de 64 bits partido en 4 bandas de 16: dos hashes a distancia <= 3 comparten al menos
+# una banda completa, así que la búsqueda por bandas indexadas no pierde vecinos cercanos
+DHASH_BANDS = 4
+MAX_DISTANCE = 3
+# Tope de candidatos por banda, los más recientes primero. Las bandas sin gradiente ("0000",
+# "ffff": zonas lisas, capturas en blanco) las comparten miles de imágenes; con el tope se
+# siguen consultando (sin ellas se rompe la garantía de arriba) sin leer miles de documentos
+BAND_CANDIDATES = 500
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def dhash(data: bytes):
+    """Hash perceptual por diferencias (9x8 en grises); None si no es una imagen o falta Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("L", (64, 64))
+            pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def bands(value: int) -> list:
+    width = 64 // DHASH_BANDS
+    mask = (1 << width) - 1
+    return [f"{i}:{(value >> (i * width)) & mask:04x}" for i in range(DHASH_BANDS)]
+
+
+def compute_hashes(data: bytes) -> dict:
+    value = dhash(data)
+    return {
+        "sha256": content_hash(data),
+        "dhash": f"{value:016x}" if value is not None else None,
+        "bands": bands(value) if value is not None else [],
+    }
+
+
+async def find_duplicates(hashes: dict, tx_id: str, limit: int = 20) -> list:
+    """Comprobantes de otras transacciones con el mismo contenido o una imagen casi igual.
+
+    Cada banda se consulta por separado con su propio tope, así una banda muy poblada no
+    desplaza a los vecinos de las demás. La garantía de las bandas vale mientras ninguna pase
+    de BAND_CANDIDATES comprobantes; en las que pasan se miran los más recientes.
+    """
+    db = get_db()
+    matches = {}
+    async for doc in db.proof_hashes.find({"sha256": hashes["sha256"], "tx_id": {"$ne": tx_id}}, {"tx_id": 1}).limit(limit):
+        matches[doc["tx_id"]] = {"tx_id": doc["tx_id"], "kind": "exact", "distance": 0}
+    if hashes["dhash"]:
+        value = int(hashes["dhash"], 16)
+        seen = set()
+        for band in hashes["bands"]:
+            cursor = db.proof_hashes.find({"bands": band, "tx_id": {"$ne": tx_id}}, {"tx_id": 1, "dhash": 1}) \
+                .sort("_id", -1).limit(BAND_CANDIDATES)
+            async for doc in cursor:
+                if doc["_id"] in seen:
+                    continue
+                seen.add(doc["_id"])
+                distance = bin(value ^ int(doc["dhash"], 16)).count("1")
+                if distance <= MAX_DISTANCE and doc["tx_id"] not in matches:
+                    matches[doc["tx_id"]] = {"tx_id": doc["tx_id"], "kind": "similar", "distance": distance}
+    return sorted(matches.values(), key=lambda m: m["distance"])[:limit]
+
+
+async def fingerprint(data: bytes, tx_id: str) -> tuple:
+    """Calcula los hashes fuera del event loop y busca reutilizaciones."""
+    hashes = await asyncio.to_thread(compute_hashes, data)
+    try:
+        duplicates = await find_duplicates(hashes, tx_id)
+    except PyMongoError as e:
+        print(f"⚠️ No se pudo buscar comprobantes duplicados: {e}")
+        duplicates = []
+    return hashes, duplicates
+
+
+async def register_proof(tx: dict, hashes: dict):
+    db = get_db()
+    await db.proof_hashes.insert_one({
+        "tx_id": str(tx["_id"]),
+        "user_id": tx["user_id"],
+        "provider_id": tx["provider_id"],
+        **hashes,
+        "created_at": datetime.utcnow(),
+    })
@@ -0,0 +1,174 @@
+import asyncio
+import math
+from datetime import datetime
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from config import get_settings
+from database import get_db
+from services.geo import haversine_np
+from services.state import on_invalidate
+
+settings = get_settings()
+
+SEARCHABLE_STATUSES = ("active", "pending_review")
+CELL_DEG = 0.05  # ~5.5 km por celda en Costa Rica
+
+# Solo lo que necesita format_provider; el resto del documento no se guarda en memoria
+PROJECTION = {
+    "user_id": 1, "business_name": 1, "sinpe_number": 1, "sinpe_holder_name": 1, "address": 1,
+    "location": 1, "description": 1, "verification_status": 1, "is_available": 1,
+    "declared_liquidity": 1, "available_liquidity": 1, "min_amount": 1, "max_amount": 1,
+    "reputation_score": 1, "total_transactions": 1, "cover_photo": 1, "logo": 1,
+    "created_at": 1, "last_seen_at": 1,
+}
+
+
+class ProviderRecord:
+    __slots__ = ("id", "lat", "lng", "min_amount", "max_amount", "liquidity", "last_seen", "doc")
+
+    def __init__(self, doc: dict):
+        lng, lat = doc["location"]["coordinates"]
+        available = doc.get("available_liquidity", doc.get("declared_liquidity"))
+        self.id = str(doc["_id"])
+        self.lat = lat
+        self.lng = lng
+        self.min_amount = doc.get("min_amount", 1000)
+        self.max_amount = doc.get("max_amount", 100000)
+        self.liquidity = math.nan if available is None else available
+        self.last_seen = doc["last_seen_at"].timestamp() if doc.get("last_seen_at") else 0.0
+        self.doc = doc
+
+
+def _searchable(doc: dict) -> bool:
+    return bool(doc.get("is_available")) and doc.get("verification_status") in SEARCHABLE_STATUSES and "location" in doc
+
+
+class ProviderIndex:
+    """Proveedores disponibles en memoria: columnas NumPy más una grilla de celdas para acotar candidatos."""
+
+    def __init__(self):
+        self.ready = False
+        self._records = {}
+        self._dirty = True
+        self._task = None
+        self._rows = []
+        self._row_of = {}
+        self._grid = {}
+
+    def upsert(self, doc: dict):
+        if _searchable(doc):
+            self._records[str(doc["_id"])] = ProviderRecord(doc)
+        else:
+            self._records.pop(str(doc["_id"]), None)
+        self._dirty = True
+
+    def remove(self, provider_id: str):
+        if self._records.pop(provider_id, None):
+            self._dirty = True
+
+    def touch(self, provider_id: str, at: datetime):
+        """Un latido solo mueve `last_seen`: se actualiza la columna en su lugar, sin reconstruir."""
+        record = self._records.get(provider_id)
+        if record:
+            record.last_seen = max(record.last_seen, at.timestamp())
+            row = self._row_of.get(provider_id)
+            if not self._dirty and row is not None:
+                self._last_seen[row] = record.last_seen
+
+    def _rebuild(self):
+        rows = list(self._records.values())
+        self._rows = rows
+        self._row_of = {r.id: i for i, r in enumerate(rows)}
+        self._lat = np.fromiter((r.lat for r in rows), dtype=np.float64, count=len(rows))
+        self._lng = np.fromiter((r.lng for r in rows), dtype=np.float64, count=len(rows))
+        self._min = np.fromiter((r.min_amount for r in rows), dtype=np.float64, count=len(rows))
+        self._max = np.fromiter((r.max_amount for r in rows), dtype=np.float64, count=len(rows))
+        self._liquidity = np.fromiter((r.liquidity for r in rows), dtype=np.float64, count=len(rows))
+        self._last_seen = np.fromiter((r.last_seen for r in rows), dtype=np.float64, count=len(rows))
+        cells = np.floor(self._lat / CELL_DEG).astype(np.int64), np.floor(self._lng / CELL_DEG).astype(np.int64)
+        grid = {}
+        for i, cell in enumerate(zip(*cells)):
+            grid.setdefault(cell, []).append(i)
+        self._grid = {cell: np.array(idx, dtype=np.intp) for cell, idx in grid.items()}
+        self._dirty = False
+
+    def search(self, lat: float, lng: float, amount: float, radius_km: float, min_last_seen: datetime,
+               limit: int = 20) -> list:
+        """Devuelve (doc, distancia_km) de los proveedores elegibles, como el $near de Mongo."""
+        if self._dirty:
+            self._rebuild()
+        if not self._rows:
+            return []
+
+        dlat = radius_km / 111.32
+        dlng = radius_km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+        lat_cells = range(math.floor((lat - dlat) / CELL_DEG), math.floor((lat + dlat) / CELL_DEG) + 1)
+        lng_cells = range(math.floor((lng - dlng) / CELL_DEG), math.floor((lng + dlng) / CELL_DEG) + 1)
+        parts = [self._grid[(a, b)] for a in lat_cells for b in lng_cells if (a, b) in self._grid]
+        if not parts:
+            return []
+        idx = np.concatenate(parts)
+
+        dist = haversine_np(lat, lng, self._lat[idx], self._lng[idx])
+        mask = (dist <= radius_km) & (self._last_seen[idx] >= min_last_seen.timestamp())
+        if amount > 0:
+            liquidity = self._liquidity[idx]
+            mask &= (self._min[idx] <= amount) & (self._max[idx] >= amount)
+            mask &= np.isnan(liquidity) | (liquidity >= amount)
+        idx, dist = idx[mask], dist[mask]
+        order = np.argsort(dist)[:limit]
+        return [(self._rows[i].doc, float(d)) for i, d in zip(idx[order], dist[order])]
+
+    async def load_one(self, provider_id: str):
+        db = get_db()
+        doc = await db.providers.find_one({"_id": ObjectId(provider_id)}, PROJECTION)
+        if doc:
+            self.upsert(doc)
+        else:
+            self.remove(provider_id)
+
+    async def reconcile(self):
+        db = get_db()
+        cursor = db.providers.find(
+            {"is_available": True, "verification_status": {"$in": list(SEARCHABLE_STATUSES)}},
+            PROJECTION,
+        )
+        records = {}
+        async for doc in cursor:
+            if "location" in doc:
+                record = ProviderRecord(doc)
+                # Los latidos recientes aún no volcados a Mongo no deben retroceder
+                previous = self._records.get(record.id)
+                if previous:
+                    record.last_seen = max(record.last_seen, previous.last_seen)
+                records[record.id] = record
+        self._records = records
+        self._dirty = True
+        self.ready = True
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except PyMongoError as e:
+                print(f"⚠️ No se pudo reconciliar el índice de proveedores: {e}")
+            await asyncio.sleep(settings.provider_index_reconcile_seconds)
+
+    async def start(self):
+        if not settings.provider_index_enabled:
+            return
+        on_invalidate("provider", self.load_one)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+provider_index = ProviderIndex()
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
+from config import get_settings
+from database import get_db
+from services.state import invalidate, on_invalidate
+
+settings = get_settings()
+
+
+class RevocationList:
+    """Tokens y usuarios revocados, copiados en memoria desde la colección TTL `revoked_tokens`.
+
+    Un documento revoca un token puntual (`jti`) o todos los tokens de un usuario
+    emitidos antes de `revoked_before`.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+        self._users = {}
+        self._last_sync = datetime.min
+        self._task = None
+
+    def is_revoked(self, payload: dict) -> bool:
+        jti = payload.get("jti")
+        if jti and jti in self._tokens:
+            return True
+        revoked_before = self._users.get(payload.get("sub"))
+        return bool(revoked_before and payload.get("iat", 0) <= revoked_before.timestamp())
+
+    def _apply(self, doc: dict):
+        if doc.get("jti"):
+            self._tokens[doc["jti"]] = doc["expires_at"]
+        if doc.get("user_id"):
+            current = self._users.get(doc["user_id"])
+            self._users[doc["user_id"]] = max(current, doc["revoked_before"]) if current else doc["revoked_before"]
+
+    async def _insert(self, doc: dict):
+        db = get_db()
+        await db.revoked_tokens.insert_one(doc)
+        self._apply(doc)
+
+    async def revoke_token(self, jti: str, expires_at: datetime):
+        await self._insert({"jti": jti, "expires_at": expires_at, "created_at": datetime.utcnow()})
+        await invalidate("token", jti, local=False)
+
+    async def revoke_user(self, user_id: str):
+        now = datetime.utcnow()
+        await self._insert({
+            "user_id": user_id,
+            "revoked_before": now,
+            # Pasado el vencimiento máximo de un access token la marca ya no hace falta
+            "expires_at": now + timedelta(minutes=settings.jwt_expire_minutes),
+            "created_at": now,
+        })
+        await invalidate("user", user_id)
+
+    @property
+    def overlap(self) -> timedelta:
+        return timedelta(seconds=2 * settings.auth_revocation_sync_seconds)
+
+    async def sync(self):
+        """Trae las revocaciones nuevas, releyendo una ventana de solape.
+
+        Un documento puede confirmarse después de otro con `created_at` mayor (relojes de
+        otros workers, escrituras lentas); sin el solape quedaría detrás de la marca para
+        siempre. `_apply` es idempotente, así que releer no duplica nada.
+        """
+        db = get_db()
+        now = datetime.utcnow()
+        since = self._last_sync - self.overlap if self._last_sync > datetime.min + self.overlap else datetime.min
+        cursor = db.revoked_tokens.find({"created_at": {"$gt": since}, "expires_at": {"$gt": now}})
+        async for doc in cursor:
+            self._apply(doc)
+            self._last_sync = max(self._last_sync, doc["created_at"])
+        self._tokens = {k: v for k, v in self._tokens.items() if v > now}
+        cutoff = now - timedelta(minutes=settings.jwt_expire_minutes)
+        self._users = {k: v for k, v in self._users.items() if v > cutoff}
+
+    async def _reload_on_notice(self, key: str):
+        await self.sync()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.auth_revocation_sync_seconds)
+            try:
+                await self.sync()
+            except PyMongoError as e:
+                print(f"⚠️ No se pudo sincronizar la lista de revocación: {e}")
+
+    async def start(self):
+        on_invalidate("token", self._reload_on_notice)
+        on_invalidate("user", self._reload_on_notice)
+        await self.sync()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocations = RevocationList()
@@ -0,0 +1,267 @@
+import hashlib
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from config import get_settings
+from database import get_db
+from services.pending import pending_projection
+
+settings = get_settings()
+
+VELOCITY_WINDOW = timedelta(hours=1)
+CANCEL_WINDOW = timedelta(days=7)
+IDLE_AFTER = timedelta(days=7)
+MAX_TRACKED_TXS = 200000
+MAX_TRACKED_PROOFS = 200000
+PRUNE_EVERY = 10000
+
+# Solo se puede retener lo que todavía no se verificó
+HOLDABLE_STATUSES = {"requested", "accepted", "sinpe_sent", "proof_uploaded"}
+
+RULES = {
+    "user_velocity": 0.4,
+    "amount_spike": 0.3,
+    "user_cancel_rate": 0.3,
+    "provider_cancel_rate": 0.2,
+    "proof_reused": 0.8,
+}
+
+
+def proof_key(tx: dict):
+    """Huella del comprobante: el hash del contenido si existe, si no el de la URL."""
+    if tx.get("proof_sha256"):
+        return tx["proof_sha256"]
+    if tx.get("proof_s3_url"):
+        return hashlib.sha256(tx["proof_s3_url"].encode()).hexdigest()
+    return None
+
+
+class EntityWindow:
+    """Ventanas deslizantes de un usuario o proveedor, en tiempo de evento."""
+
+    __slots__ = ("requests", "closed", "amount_n", "amount_mean", "last_ts")
+
+    def __init__(self):
+        self.requests = deque()
+        self.closed = deque()
+        self.amount_n = 0
+        self.amount_mean = 0.0
+        self.last_ts = datetime.min
+
+    def _prune(self, now: datetime):
+        while self.requests and self.requests[0] < now - VELOCITY_WINDOW:
+            self.requests.popleft()
+        while self.closed and self.closed[0][0] < now - CANCEL_WINDOW:
+            self.closed.popleft()
+
+    def add(self, status: str, amount: float, now: datetime):
+        self.last_ts = max(self.last_ts, now)
+        if status == "requested":
+            self.requests.append(now)
+        elif status in ("completed", "cancelled"):
+            self.closed.append((now, status == "cancelled"))
+        if status == "completed":
+            self.amount_n += 1
+            self.amount_mean += (amount - self.amount_mean) / self.amount_n
+        self._prune(now)
+
+    def velocity(self) -> int:
+        return len(self.requests)
+
+    def cancel_rate(self) -> tuple:
+        if not self.closed:
+            return 0.0, 0
+        return sum(1 for _, cancelled in self.closed if cancelled) / len(self.closed), len(self.closed)
+
+
+class RiskEngine:
+    """Puntaje de riesgo por transacción a partir de los eventos de su ciclo de vida.
+
+    `observe` solo actualiza ventanas en memoria y es idempotente por (transacción, estado),
+    así puede alimentarse a la vez de las rutas locales y del change stream. `assess` además
+    persiste la marca o retención en la transacción.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._providers = {}
+        self._seen = OrderedDict()
+        self._proofs = OrderedDict()
+        self._events = 0
+
+    async def warm(self):
+        """Reconstruye las ventanas con lo ocurrido en el último `CANCEL_WINDOW` al arrancar."""
+        db = get_db()
+        since = datetime.utcnow() - CANCEL_WINDOW
+        projection = {"user_id": 1, "provider_id": 1, "status": 1, "requested_amount": 1,
+                      "created_at": 1, "updated_at": 1, "proof_sha256": 1, "proof_s3_url": 1}
+        cursor = db.transactions.find({"updated_at": {"$gte": since}}, projection).sort("updated_at", 1)
+        async for tx in cursor:
+            if tx["status"] != "requested":
+                self.observe({**tx, "status": "requested", "updated_at": tx["created_at"]})
+            self.observe(tx)
+
+    def _window(self, table: dict, key: str) -> EntityWindow:
+        window = table.get(key)
+        if window is None:
+            window = table[key] = EntityWindow()
+        return window
+
+    def observe(self, tx: dict) -> bool:
+        tx_id, status = str(tx["_id"]), tx["status"]
+        if self._seen.get(tx_id) == status:
+            return False
+        self._seen[tx_id] = status
+        self._seen.move_to_end(tx_id)
+        if len(self._seen) > MAX_TRACKED_TXS:
+            self._seen.popitem(last=False)
+
+        now = tx.get("updated_at") or datetime.utcnow()
+        amount = tx.get("requested_amount", 0)
+        self._window(self._users, tx["user_id"]).add(status, amount, now)
+        self._window(self._providers, tx["provider_id"]).add(status, amount, now)
+
+        key = proof_key(tx)
+        if key and key not in self._proofs:
+            self._proofs[key] = tx_id
+            if len(self._proofs) > MAX_TRACKED_PROOFS:
+                self._proofs.popitem(last=False)
+
+        self._events += 1
+        if self._events % PRUNE_EVERY == 0:
+            self._prune_idle(now)
+        return True
+
+    def _prune_idle(self, now: datetime):
+        for table in (self._users, self._providers):
+            for key in [k for k, w in table.items() if w.last_ts < now - IDLE_AFTER]:
+                del table[key]
+
+    def score(self, tx: dict) -> tuple:
+        reasons = []
+        user = self._users.get(tx["user_id"]) or EntityWindow()
+        provider = self._providers.get(tx["provider_id"]) or EntityWindow()
+
+        if user.velocity() > settings.risk_max_requests_per_hour:
+            reasons.append("user_velocity")
+        if user.amount_n >= 3 and tx.get("requested_amount", 0) > settings.risk_amount_spike * user.amount_mean:
+            reasons.append("amount_spike")
+        rate, closed = user.cancel_rate()
+        if closed >= 4 and rate >= 0.5:
+            reasons.append("user_cancel_rate")
+        rate, closed = provider.cancel_rate()
+        if closed >= 10 and rate >= 0.5:
+            reasons.append("provider_cancel_rate")
+        key = proof_key(tx)
+        if tx.get("proof_duplicates") or (key and self._proofs.get(key, str(tx["_id"])) != str(tx["_id"])):
+            reasons.append("proof_reused")
+
+        return round(min(1.0, sum(RULES[r] for r in reasons)), 2), reasons
+
+    def evaluate(self, tx: dict) -> dict:
+        """Subdocumento `risk` que le corresponde a `tx`, o None si no hay que cambiar el guardado.
+
+        La retención es pegajosa: un puntaje posterior más bajo no la levanta mientras la
+        transacción siga en un estado retenible; solo un admin la libera.
+        """
+        score, reasons = self.score(tx)
+        previous = tx.get("risk") or {}
+        holdable = tx["status"] in HOLDABLE_STATUSES
+        if score < settings.risk_flag_score:
+            if previous.get("held") and not holdable:
+                return {**previous, "held": False}
+            return None
+        held = (score >= settings.risk_hold_score or bool(previous.get("held"))) and holdable
+        risk = {"score": score, "reasons": reasons, "held": held, "flagged_at": datetime.utcnow()}
+        if previous.get("released_at"):
+            # Un admin ya la liberó: se actualiza el puntaje pero no se vuelve a retener
+            risk.update(held=False, released_at=previous["released_at"], released_by=previous.get("released_by"))
+        return risk
+
+    async def assess(self, tx: dict) -> dict:
+        """Observa y puntúa `tx`; si supera el umbral la marca y, si corresponde, la retiene."""
+        self.observe(tx)
+        risk = self.evaluate(tx)
+        if risk is None:
+            return None
+        try:
+            await get_db().transactions.update_one({"_id": tx["_id"]}, {"$set": {"risk": risk}})
+        except PyMongoError as e:
+            print(f"⚠️ No se pudo guardar el riesgo de {tx['_id']}: {e}")
+        tx["risk"] = risk
+        return risk
+
+
+def is_held(tx: dict) -> bool:
+    return bool((tx.get("risk") or {}).get("held"))
+
+
+async def score_history(since: datetime = None, until: datetime = None, chunk: int = 5000) -> dict:
+    """Reproduce el log de eventos en un solo orden global de `ts` con un motor nuevo.
+
+    Sirve para ajustar umbrales: compara lo que se habría marcado con las disputas reales.
+    Las transacciones se leen por lotes a medida que aparecen sus eventos y se cuentan y
+    descartan al llegar su último evento; en memoria quedan solo las que siguen abiertas.
+    """
+    db = get_db()
+    engine = RiskEngine()
+    created = {k: v for k, v in (("$gte", since), ("$lt", until)) if v}
+    stats = {"transactions": 0, "events": 0, "flagged": 0, "held": 0, "disputed": 0, "flagged_disputed": 0, "reasons": {}}
+    open_txs, worst = {}, {}
+
+    def finish(tx_id: str):
+        tx = open_txs.pop(tx_id)
+        score, reasons = worst.pop(tx_id, (0, []))
+        flagged = score >= settings.risk_flag_score
+        disputed = tx["status"] == "disputed" or bool(tx.get("dispute"))
+        stats["transactions"] += 1
+        stats["flagged"] += flagged
+        stats["held"] += score >= settings.risk_hold_score
+        stats["disputed"] += disputed
+        stats["flagged_disputed"] += flagged and disputed
+        for r in reasons if flagged else []:
+            stats["reasons"][r] = stats["reasons"].get(r, 0) + 1
+
+    async def replay(events: list):
+        missing = list({e["tx_id"] for e in events if e["tx_id"] not in open_txs})
+        if missing:
+            query = {"_id": {"$in": [ObjectId(i) for i in missing]}}
+            if created:
+                query["created_at"] = created
+            async for tx in db.transactions.find(query):
+                open_txs[str(tx["_id"])] = tx
+        for e in events:
+            base = open_txs.get(e["tx_id"])
+            if base is None:
+                continue  # creada fuera del rango pedido
+            tx = {**base, "status": e["status"], "updated_at": e["ts"]}
+            if e["status"] != "proof_uploaded":
+                tx.pop("proof_sha256", None)
+                tx.pop("proof_s3_url", None)
+                tx.pop("proof_duplicates", None)
+            engine.observe(tx)
+            score, reasons = engine.score(tx)
+            if score > worst.get(e["tx_id"], (0, []))[0]:
+                worst[e["tx_id"]] = (score, reasons)
+            stats["events"] += 1
+            if e["status"] == base["status"]:
+                finish(e["tx_id"])
+
+    # Ningún evento de una transacción es anterior a su creación
+    cursor = db.transaction_events.find({"ts": {"$gte": since}} if since else {}, allow_disk_use=True) \
+        .sort([("ts", 1), ("_id", 1)]).batch_size(chunk)
+    batch = []
+    async for e in cursor:
+        batch.append(e)
+        if len(batch) >= chunk:
+            await replay(batch)
+            batch = []
+    await replay(batch)
+    for tx_id in list(open_txs):
+        finish(tx_id)
+    return stats
+
+
+risk_engine = RiskEngine()
+pending_projection.subscribe(risk_engine.observe)
@@ -1,3 +1,4 @@
+import asyncio
 import boto3
 from botocore.exceptions import ClientError
 from fastapi import UploadFile, HTTPException
@@ -35,7 +36,9 @@ async def upload_proof(file: UploadFile, transaction_id: str) -> str:
 
     try:
         contents = await file.read()
-        s3.put_object(
+        # boto3 es bloqueante: en un hilo para no frenar el event loop (y el hash del comprobante)
+        await asyncio.to_thread(
+            s3.put_object,
             Bucket=settings.s3_bucket_name,
             Key=key,
             Body=contents,
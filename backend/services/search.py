@@ -0,0 +1,156 @@
+import math
+import re
+import unicodedata
+from bson import ObjectId
+from pymongo import UpdateOne
+from database import get_db
+
+# Campos de los que salen los trigramas de cada colección
+GRAM_SOURCES = {
+    "providers": ("business_name", "address", "sinpe_holder_name"),
+    "users": ("full_name",),
+}
+PREFIX_FIELDS = {
+    "providers": {"digits": "sinpe_number", "email": "bank_email"},
+    "users": {"digits": "phone", "email": "email"},
+}
+MIN_SIMILARITY = 0.3
+MAX_GRAMS = 64
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes y solo letras y números separados por un espacio."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def trigrams(text: str) -> list:
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return sorted(grams)
+
+
+def search_grams(doc: dict, collection: str) -> list:
+    return trigrams(" ".join(doc.get(field) or "" for field in GRAM_SOURCES[collection]))
+
+
+def gram_commonness(gram: str) -> int:
+    """Orden aproximado de frecuencia: los trigramas de inicio de palabra ("  m", " ma")
+    aparecen en gran parte de la colección; los interiores son mucho más selectivos."""
+    if gram.startswith("  "):
+        return 2
+    if gram.startswith(" ") or gram.endswith(" "):
+        return 1
+    return 0
+
+
+def probe_grams(grams: list) -> list:
+    """Subconjunto de trigramas que basta buscar sin perder resultados.
+
+    Para llegar a MIN_SIMILARITY un documento necesita `m` de los `n` trigramas; entonces
+    contiene al menos uno de cualesquiera `n - m + 1` (palomar). Se eligen los más raros.
+    """
+    needed = max(1, math.ceil(MIN_SIMILARITY * len(grams)))
+    return sorted(grams, key=gram_commonness)[:len(grams) - needed + 1]
+
+
+def classify(q: str):
+    """Devuelve el modo de búsqueda y el término ya normalizado."""
+    q = q.strip()
+    digits = re.sub(r"[\s\-+]", "", q)
+    if digits.isdigit():
+        return "digits", digits
+    if "@" in q:
+        return "email", q.lower()
+    return "fuzzy", q
+
+
+def encode_cursor(key, doc_id) -> str:
+    return f"{key}:{doc_id}"
+
+
+def decode_cursor(cursor: str):
+    key, doc_id = cursor.rsplit(":", 1)
+    return key, ObjectId(doc_id)
+
+
+async def prefix_search(collection: str, field: str, prefix: str, limit: int, cursor: str = None) -> tuple:
+    """Prefijo anclado sobre un campo indexado, paginado por (campo, _id)."""
+    db = get_db()
+    query = {field: {"$regex": f"^{re.escape(prefix)}"}}
+    if cursor:
+        key, oid = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [{field: {"$gt": key}}, {field: key, "_id": {"$gt": oid}}]}]}
+    docs = await db[collection].find(query, {"password_hash": 0, "search_grams": 0}) \
+        .sort([(field, 1), ("_id", 1)]).limit(limit).to_list(length=limit)
+    next_cursor = encode_cursor(docs[-1][field], docs[-1]["_id"]) if len(docs) == limit else None
+    return docs, next_cursor
+
+
+async def fuzzy_search(collection: str, q: str, limit: int, cursor: str = None) -> tuple:
+    """Candidatos por palabra (índice de texto) o por trigramas, ordenados por similitud.
+
+    La similitud es la fracción de trigramas de la búsqueda presentes en el documento,
+    así que un error de tipeo solo baja un poco el puntaje en vez de excluir el resultado.
+    Los candidatos salen solo de los trigramas más selectivos. Todos se puntúan antes de
+    ordenar: cortar antes del puntaje dejaría el ranking y el cursor (score, _id) al azar.
+    El $sort seguido de $limit es un top-K, así que la memoria queda acotada a `limit`.
+    """
+    db = get_db()
+    grams = trigrams(q)[:MAX_GRAMS]
+    if not grams:
+        return [], None
+    candidates = {"search_grams": {"$in": probe_grams(grams)}}
+    if collection == "providers":
+        candidates = {"$or": [{"$text": {"$search": q}}, candidates]}
+
+    pipeline = [
+        {"$match": candidates},
+        {"$addFields": {"score": {"$round": [
+            {"$divide": [{"$size": {"$setIntersection": [{"$ifNull": ["$search_grams", []]}, grams]}}, len(grams)]}, 4
+        ]}}},
+        {"$match": {"score": {"$gte": MIN_SIMILARITY}}},
+    ]
+    if cursor:
+        key, oid = decode_cursor(cursor)
+        score = float(key)
+        pipeline.append({"$match": {"$or": [{"score": {"$lt": score}}, {"score": score, "_id": {"$gt": oid}}]}})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": {"password_hash": 0, "search_grams": 0}},
+    ]
+    docs = await db[collection].aggregate(pipeline).to_list(length=limit)
+    next_cursor = encode_cursor(docs[-1]["score"], docs[-1]["_id"]) if len(docs) == limit else None
+    return docs, next_cursor
+
+
+async def search(collection: str, q: str, limit: int = 20, cursor: str = None) -> dict:
+    mode, term = classify(q)
+    if mode in PREFIX_FIELDS[collection]:
+        docs, next_cursor = await prefix_search(collection, PREFIX_FIELDS[collection][mode], term, limit, cursor)
+    else:
+        docs, next_cursor = await fuzzy_search(collection, term, limit, cursor)
+    return {"mode": mode, "docs": docs, "next_cursor": next_cursor}
+
+
+async def backfill_search_grams(collection: str, batch_size: int = 1000) -> int:
+    """Calcula `search_grams` para documentos que aún no lo tienen, por lotes de _id."""
+    db = get_db()
+    projection = {field: 1 for field in GRAM_SOURCES[collection]}
+    updated, last_id = 0, None
+    while True:
+        query = {"search_grams": {"$exists": False}}
+        if last_id:
+            query["_id"] = {"$gt": last_id}
+        docs = await db[collection].find(query, projection).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            return updated
+        last_id = docs[-1]["_id"]
+        result = await db[collection].bulk_write([
+            UpdateOne({"_id": d["_id"]}, {"$set": {"search_grams": search_grams(d, collection)}}) for d in docs
+        ], ordered=False)
+        updated += result.modified_count
@@ -0,0 +1,103 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from fastapi import HTTPException
+from config import get_settings
+from database import get_db
+
+settings = get_settings()
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _successor_key(previous: str) -> AESGCM:
+    return AESGCM(hashlib.sha256(f"successor:{previous}".encode()).digest())
+
+
+def _seal(previous: str, successor: str) -> str:
+    """Cifra el sucesor (AES-GCM) con una clave que solo puede derivar quien tiene el token anterior.
+
+    El hash del token anterior va como dato asociado: un sucesor copiado a otro registro no abre.
+    """
+    nonce = secrets.token_bytes(12)
+    return (nonce + _successor_key(previous).encrypt(nonce, successor.encode(), _hash(previous).encode())).hex()
+
+
+def _unseal(previous: str, sealed: str):
+    """Devuelve el sucesor, o None si el sello fue alterado o no corresponde a este token."""
+    data = bytes.fromhex(sealed)
+    try:
+        return _successor_key(previous).decrypt(data[:12], data[12:], _hash(previous).encode()).decode()
+    except InvalidTag:
+        return None
+
+
+async def _store_refresh_token(token: str, user_id: str, family_id: str):
+    db = get_db()
+    now = datetime.utcnow()
+    await db.refresh_tokens.insert_one({
+        "_id": _hash(token),
+        "user_id": user_id,
+        "family_id": family_id,
+        "used_at": None,
+        "created_at": now,
+        "expires_at": now + timedelta(days=settings.refresh_token_days),
+    })
+
+
+async def issue_refresh_token(user_id: str, family_id: str = None) -> str:
+    """Emite un refresh token opaco; en la base solo queda su hash."""
+    token = secrets.token_urlsafe(48)
+    await _store_refresh_token(token, user_id, family_id or uuid.uuid4().hex)
+    return token
+
+
+async def rotate_refresh_token(token: str) -> tuple:
+    """Consume el refresh token y emite el siguiente de la misma familia.
+
+    Reusar un token ya rotado indica robo y se invalida toda la familia, salvo dentro de
+    la ventana de gracia: dos pestañas que renuevan a la vez reciben el mismo sucesor,
+    siempre que ese sucesor siga sin usarse.
+    """
+    db = get_db()
+    now = datetime.utcnow()
+    key = _hash(token)
+    new_token = secrets.token_urlsafe(48)
+    doc = await db.refresh_tokens.find_one_and_update(
+        {"_id": key, "used_at": None, "expires_at": {"$gt": now}},
+        {"$set": {"used_at": now, "successor": _seal(token, new_token)}},
+    )
+    if not doc:
+        existing = await db.refresh_tokens.find_one({"_id": key}, {"used_at": 1, "family_id": 1, "user_id": 1, "successor": 1})
+        if existing and existing.get("used_at"):
+            grace = timedelta(seconds=settings.refresh_reuse_grace_seconds)
+            if existing.get("successor") and now - existing["used_at"] <= grace:
+                successor = _unseal(token, existing["successor"])
+                # Si el sucesor ya rotó, otra copia del token avanzó la sesión: se trata como robo.
+                # Que aún no exista es normal: la otra pestaña lo guarda justo después de sellarlo
+                if successor and not await db.refresh_tokens.find_one(
+                    {"_id": _hash(successor), "used_at": {"$ne": None}}, {"_id": 1}
+                ):
+                    return existing["user_id"], existing["family_id"], successor
+            await db.refresh_tokens.delete_many({"family_id": existing["family_id"]})
+        raise HTTPException(status_code=401, detail="Sesión expirada. Inicia sesión de nuevo.")
+
+    await _store_refresh_token(new_token, doc["user_id"], doc["family_id"])
+    return doc["user_id"], doc["family_id"], new_token
+
+
+async def revoke_family(token: str):
+    db = get_db()
+    doc = await db.refresh_tokens.find_one({"_id": _hash(token)}, {"family_id": 1})
+    if doc:
+        await db.refresh_tokens.delete_many({"family_id": doc["family_id"]})
+
+
+async def revoke_user_sessions(user_id: str):
+    db = get_db()
+    await db.refresh_tokens.delete_many({"user_id": user_id})
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import time
+import uuid
+from config import get_settings
+
+settings = get_settings()
+
+INVALIDATE_CHANNEL = "coinnet:invalidate"
+
+
+class MemoryState:
+    """Estado compartido dentro de un solo proceso (modo de un worker y pruebas locales)."""
+
+    errors = ()
+
+    def __init__(self):
+        self._values = {}
+        self._subscribers = {}
+
+    def _alive(self, key):
+        value, expires = self._values.get(key, (None, None))
+        if expires is not None and expires < time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return value
+
+    async def get(self, key: str):
+        return self._alive(key)
+
+    async def set(self, key: str, value, ttl: int = None):
+        self._values[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    async def incr(self, key: str, amount: int = 1, ttl: int = None) -> int:
+        value = int(self._alive(key) or 0) + amount
+        _, expires = self._values.get(key, (None, None))
+        if expires is None and ttl:
+            expires = time.monotonic() + ttl
+        self._values[key] = (value, expires)
+        return value
+
+    async def delete(self, key: str):
+        self._values.pop(key, None)
+
+    async def publish(self, channel: str, message: dict):
+        for handler in self._subscribers.get(channel, []):
+            await handler(message)
+
+    def subscribe(self, channel: str, handler):
+        self._subscribers.setdefault(channel, []).append(handler)
+
+    async def start(self):
+        # Cada worker tendría su propio estado: cachés y proyecciones divergirían sin aviso
+        if settings.web_concurrency > 1:
+            raise RuntimeError(
+                f"WEB_CONCURRENCY={settings.web_concurrency} requiere REDIS_URL para compartir estado entre workers"
+            )
+
+    async def stop(self):
+        pass
+
+
+class RedisState:
+    """Estado compartido entre workers y réplicas sobre cualquier servidor que hable el protocolo Redis."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self._redis = redis.from_url(url, decode_responses=True)
+        self.errors = (RedisError, OSError)
+        self._subscribers = {}
+        self._task = None
+
+    async def get(self, key: str):
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value, ttl: int = None):
+        await self._redis.set(key, value, ex=ttl)
+
+    async def incr(self, key: str, amount: int = 1, ttl: int = None) -> int:
+        value = await self._redis.incrby(key, amount)
+        if ttl and value == amount:
+            await self._redis.expire(key, ttl)
+        return value
+
+    async def delete(self, key: str):
+        await self._redis.delete(key)
+
+    async def publish(self, channel: str, message: dict):
+        await self._redis.publish(channel, json.dumps(message))
+
+    def subscribe(self, channel: str, handler):
+        self._subscribers.setdefault(channel, []).append(handler)
+
+    async def _listen(self):
+        delay, connected_before = 1, False
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(*self._subscribers)
+                if connected_before:
+                    # Lo publicado durante el corte se perdió: quien tenga estado derivado lo reconstruye
+                    await _resync()
+                connected_before, delay = True, 1
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    for handler in self._subscribers.get(message["channel"], []):
+                        try:
+                            await handler(data)
+                        except Exception as e:
+                            print(f"⚠️ Error procesando mensaje de {message['channel']}: {e}")
+            except self.errors as e:
+                print(f"⚠️ Suscripción a Redis perdida, reintentando en {delay}s: {e}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except self.errors:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def start(self):
+        if self._subscribers:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._redis.aclose()
+
+
+shared_state = RedisState(settings.redis_url) if settings.redis_url else MemoryState()
+
+# Invalidación de cachés en memoria: se aplica localmente y se difunde al resto de workers
+WORKER_ID = uuid.uuid4().hex
+_invalidation_handlers = {}
+_resync_handlers = []
+
+
+def on_invalidate(kind: str, handler):
+    _invalidation_handlers.setdefault(kind, []).append(handler)
+
+
+def on_resync(handler):
+    """`handler()` se llama tras reconectar al bus, cuando pudieron perderse invalidaciones."""
+    _resync_handlers.append(handler)
+
+
+async def _resync():
+    for handler in _resync_handlers:
+        try:
+            await handler()
+        except Exception as e:
+            print(f"⚠️ No se pudo resincronizar tras reconectar: {e}")
+
+
+async def _dispatch(kind: str, key: str):
+    for handler in _invalidation_handlers.get(kind, []):
+        await handler(key)
+
+
+async def _on_message(message: dict):
+    if message.get("origin") != WORKER_ID:
+        await _dispatch(message["kind"], message["key"])
+
+
+async def invalidate(kind: str, key: str, local: bool = True):
+    """Aplica la invalidación localmente y la difunde; nunca falla por el bus.
+
+    Quien llama ya confirmó su escritura en Mongo: un corte de Redis no debe convertirla en
+    un error 500 ni cortar la limpieza que sigue (p. ej. liberar una reserva). Lo que no se
+    difundió lo cubren la resincronización al reconectar y las reconciliaciones periódicas.
+    """
+    if local:
+        await _dispatch(kind, key)
+    try:
+        await shared_state.publish(INVALIDATE_CHANNEL, {"kind": kind, "key": key, "origin": WORKER_ID})
+    except shared_state.errors as e:
+        print(f"⚠️ No se pudo difundir la invalidación {kind}:{key}: {e}")
+
+
+shared_state.subscribe(INVALIDATE_CHANNEL, _on_message)
@@ -0,0 +1,19 @@
+// Cargado por el service worker generado (workbox.importScripts)
+self.addEventListener('push', (event) => {
+  const data = event.data ? event.data.json() : {}
+  event.waitUntil(
+    self.registration.showNotification(data.title || 'Coinnet', {
+      body: data.body,
+      tag: data.tx_id,
+      data,
+      icon: '/icons/icon-192.png',
+    })
+  )
+})
+
+self.addEventListener('notificationclick', (event) => {
+  event.notification.close()
+  const { status, tx_id } = event.notification.data || {}
+  const url = status === 'requested' ? '/proveedor/solicitudes' : `/transaccion/${tx_id}`
+  event.waitUntil(self.clients.openWindow(url))
+})
@@ -15,6 +15,7 @@ export function AuthProvider({ children }) {
         setUser(JSON.parse(savedUser))
       } catch {
         localStorage.removeItem('coinnet_token')
+        localStorage.removeItem('coinnet_refresh')
         localStorage.removeItem('coinnet_user')
       }
     }
@@ -23,8 +24,9 @@ export function AuthProvider({ children }) {
 
   const login = async (email, password) => {
     const res = await api.post('/auth/login', { email, password })
-    const { access_token, user: userData } = res.data
+    const { access_token, refresh_token, user: userData } = res.data
     localStorage.setItem('coinnet_token', access_token)
+    localStorage.setItem('coinnet_refresh', refresh_token)
     localStorage.setItem('coinnet_user', JSON.stringify(userData))
     setUser(userData)
     return userData
@@ -32,19 +34,33 @@ export function AuthProvider({ children }) {
 
   const register = async (formData) => {
     const res = await api.post('/auth/register', formData)
-    const { access_token, user: userData } = res.data
+    const { access_token, refresh_token, user: userData } = res.data
     localStorage.setItem('coinnet_token', access_token)
+    localStorage.setItem('coinnet_refresh', refresh_token)
     localStorage.setItem('coinnet_user', JSON.stringify(userData))
     setUser(userData)
     return userData
   }
 
   const logout = () => {
+    const refresh_token = localStorage.getItem('coinnet_refresh')
+    if (localStorage.getItem('coinnet_token')) {
+      api.post('/auth/logout', refresh_token ? { refresh_token } : undefined).catch(() => {})
+    }
     localStorage.removeItem('coinnet_token')
+    localStorage.removeItem('coinnet_refresh')
     localStorage.removeItem('coinnet_user')
     setUser(null)
   }
 
+  const updateUser = (patch) => {
+    setUser((current) => {
+      const updated = { ...current, ...patch }
+      localStorage.setItem('coinnet_user', JSON.stringify(updated))
+      return updated
+    })
+  }
+
   const refreshUser = async () => {
     try {
       const res = await api.get('/auth/me')
@@ -57,7 +73,7 @@ export function AuthProvider({ children }) {
   }
 
   return (
-    <AuthContext.Provider value={{ user, loading, login, register, logout, refreshUser }}>
+    <AuthContext.Provider value={{ user, loading, login, register, logout, refreshUser, updateUser }}>
       {children}
     </AuthContext.Provider>
   )
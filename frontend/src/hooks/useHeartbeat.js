@@ -0,0 +1,36 @@
+import { useEffect, useState } from 'react'
+import { useAuth } from '../context/AuthContext'
+import { providerService } from '../services/providers'
+
+const HEARTBEAT_MS = 30000
+
+export function useHeartbeat() {
+  const { user, updateUser } = useAuth()
+  const [providerId, setProviderId] = useState(user?.provider_id)
+
+  useEffect(() => {
+    if (user?.provider_id) {
+      setProviderId(user.provider_id)
+      return
+    }
+    if (user?.account_type !== 'provider_business') return
+    // Sesiones abiertas antes de crear el perfil (registro → ProviderSetup) no traen provider_id
+    let cancelled = false
+    providerService.getMyProvider()
+      .then((res) => {
+        if (cancelled) return
+        setProviderId(res.data.id)
+        updateUser({ provider_id: res.data.id })
+      })
+      .catch(() => {})
+    return () => { cancelled = true }
+  }, [user?.provider_id, user?.account_type])
+
+  useEffect(() => {
+    if (!providerId) return
+    const beat = () => providerService.heartbeat(providerId).catch(() => {})
+    beat()
+    const interval = setInterval(beat, HEARTBEAT_MS)
+    return () => clearInterval(interval)
+  }, [providerId])
+}
@@ -6,7 +6,8 @@ import Card from '../../components/ui/Card'
 import { StatusBadge } from '../../components/ui/Badge'
 import { formatCRC } from '../../components/ui/AmountDisplay'
 import { providerService } from '../../services/providers'
-import { transactionService } from '../../services/transactions'
+import { dashboardService } from '../../services/dashboard'
+import { useHeartbeat } from '../../hooks/useHeartbeat'
 
 export default function ProviderDashboard() {
   const navigate = useNavigate()
@@ -15,18 +16,16 @@ export default function ProviderDashboard() {
   const [loading, setLoading] = useState(true)
   const [toggling, setToggling] = useState(false)
   const [liquidityInput, setLiquidityInput] = useState('')
+  useHeartbeat()
 
   const load = async () => {
     try {
-      const [pRes, txRes] = await Promise.all([
-        providerService.getMyProvider(),
-        transactionService.getProviderPending(),
-      ])
-      setProvider(pRes.data)
-      setPending(txRes.data)
+      const res = await dashboardService.get()
+      if (!res.data.provider) return navigate('/proveedor/setup')
+      setProvider(res.data.provider)
+      setPending(res.data.pending)
     } catch (err) {
   console.error(err)
-      if (err.response?.status === 404) navigate('/proveedor/setup')
     } finally {
       setLoading(false)
     }
@@ -6,6 +6,8 @@ import Button from '../../components/ui/Button'
 import { StatusBadge } from '../../components/ui/Badge'
 import { formatCRC } from '../../components/ui/AmountDisplay'
 import { transactionService } from '../../services/transactions'
+import { useHeartbeat } from '../../hooks/useHeartbeat'
+import { notificationService } from '../../services/notifications'
 
 const ACTION_MAP = {
   requested: { label: 'Aceptar solicitud', action: 'accept', variant: 'primary', emoji: '✅' },
@@ -93,6 +95,7 @@ function RequestCard({ tx, onRefresh }) {
 export default function ProviderRequests() {
   const [transactions, setTransactions] = useState([])
   const [loading, setLoading] = useState(true)
+  useHeartbeat()
 
   const load = async () => {
     try {
@@ -106,8 +109,20 @@ export default function ProviderRequests() {
 
   useEffect(() => {
     load()
-    const interval = setInterval(load, 10000)
-    return () => clearInterval(interval)
+    let cancelled = false
+    let interval = setInterval(load, 10000)
+    // Con Web Push activo el sondeo queda solo como respaldo
+    notificationService.enablePush()
+      .then((enabled) => {
+        if (!enabled || cancelled) return
+        clearInterval(interval)
+        interval = setInterval(load, 30000)
+      })
+      .catch(() => {})
+    return () => {
+      cancelled = true
+      clearInterval(interval)
+    }
   }, [])
 
   return (
@@ -5,9 +5,11 @@ import Button from '../../components/ui/Button'
 import Input from '../../components/ui/Input'
 import { providerService } from '../../services/providers'
 import { useLocation } from '../../hooks/useLocation'
+import { useAuth } from '../../context/AuthContext'
 
 export default function ProviderSetup() {
   const navigate = useNavigate()
+  const { updateUser } = useAuth()
   const { location, requestLocation } = useLocation()
   const [form, setForm] = useState({
     business_name: '', sinpe_number: '', sinpe_holder_name: '',
@@ -33,13 +35,14 @@ export default function ProviderSetup() {
     setLoading(true)
     setError('')
     try {
-      await providerService.create({
+      const res = await providerService.create({
         ...form,
         latitude: parseFloat(form.latitude),
         longitude: parseFloat(form.longitude),
         min_amount: parseFloat(form.min_amount),
         max_amount: parseFloat(form.max_amount),
       })
+      updateUser({ provider_id: res.data.id })
       navigate('/proveedor/dashboard')
     } catch (err) {
       setError(err.response?.data?.detail || 'Error al crear perfil')
@@ -4,7 +4,7 @@ import Layout from '../../components/ui/Layout'
 import Card from '../../components/ui/Card'
 import { StatusBadge } from '../../components/ui/Badge'
 import { formatCRC } from '../../components/ui/AmountDisplay'
-import { transactionService } from '../../services/transactions'
+import { dashboardService } from '../../services/dashboard'
 
 export default function MyTransactionsPage() {
   const [transactions, setTransactions] = useState([])
@@ -12,8 +12,8 @@ export default function MyTransactionsPage() {
   const navigate = useNavigate()
 
   useEffect(() => {
-    transactionService.getMy()
-      .then((res) => setTransactions(res.data))
+    dashboardService.get()
+      .then((res) => setTransactions(res.data.transactions))
       .catch(console.error)
       .finally(() => setLoading(false))
   }, [])
@@ -1,7 +1,9 @@
 import axios from 'axios'
 
+const baseURL = `${import.meta.env.VITE_API_URL || 'http://localhost:8000'}/api/v1`
+
 const api = axios.create({
-  baseURL: `${import.meta.env.VITE_API_URL || 'http://localhost:8000'}/api/v1`,
+  baseURL,
   timeout: 15000,
 })
 
@@ -11,11 +13,40 @@ api.interceptors.request.use((config) => {
   return config
 })
 
+// Una sola renovación en curso aunque fallen varias peticiones a la vez
+let refreshing = null
+
+const refreshSession = () => {
+  if (!refreshing) {
+    const refresh_token = localStorage.getItem('coinnet_refresh')
+    refreshing = axios.post(`${baseURL}/auth/refresh`, { refresh_token })
+      .then((res) => {
+        localStorage.setItem('coinnet_token', res.data.access_token)
+        localStorage.setItem('coinnet_refresh', res.data.refresh_token)
+        return res.data.access_token
+      })
+      .finally(() => { refreshing = null })
+  }
+  return refreshing
+}
+
 api.interceptors.response.use(
   (res) => res,
-  (error) => {
+  async (error) => {
+    const original = error.config
     if (error.response?.status === 401) {
+      if (localStorage.getItem('coinnet_refresh') && !original._retried) {
+        original._retried = true
+        try {
+          const token = await refreshSession()
+          original.headers.Authorization = `Bearer ${token}`
+          return api(original)
+        } catch {
+          // Cae al cierre de sesión
+        }
+      }
       localStorage.removeItem('coinnet_token')
+      localStorage.removeItem('coinnet_refresh')
       localStorage.removeItem('coinnet_user')
       window.location.href = '/login'
     }
@@ -0,0 +1,6 @@
+import api from './api'
+
+export const dashboardService = {
+  get: () =>
+    api.get('/dashboard'),
+}
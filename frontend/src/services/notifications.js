@@ -0,0 +1,33 @@
+import api from './api'
+
+const toUint8 = (base64) => {
+  const padded = (base64 + '='.repeat((4 - (base64.length % 4)) % 4)).replace(/-/g, '+').replace(/_/g, '/')
+  return Uint8Array.from(atob(padded), (c) => c.charCodeAt(0))
+}
+
+export const notificationService = {
+  getVapidKey: () =>
+    api.get('/notifications/vapid-key'),
+
+  subscribe: (subscription) =>
+    api.post('/notifications/subscriptions', subscription),
+
+  unsubscribe: (endpoint) =>
+    api.delete('/notifications/subscriptions', { params: { endpoint } }),
+
+  // Devuelve true si el navegador quedó suscrito a Web Push
+  enablePush: async () => {
+    if (!('serviceWorker' in navigator) || !('PushManager' in window)) return false
+    const { data } = await notificationService.getVapidKey()
+    if (!data.public_key) return false
+    if ((await Notification.requestPermission()) !== 'granted') return false
+    const registration = await navigator.serviceWorker.ready
+    const subscription = (await registration.pushManager.getSubscription()) ||
+      (await registration.pushManager.subscribe({
+        userVisibleOnly: true,
+        applicationServerKey: toUint8(data.public_key),
+      }))
+    await notificationService.subscribe(subscription.toJSON())
+    return true
+  },
+}
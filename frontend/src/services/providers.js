@@ -18,4 +18,7 @@ export const providerService = {
 
   setAvailability: (id, is_available, declared_liquidity = null) =>
     api.post(`/providers/${id}/availability`, { is_available, declared_liquidity }),
+
+  heartbeat: (id) =>
+    api.post(`/providers/${id}/heartbeat`),
 }
@@ -7,9 +7,6 @@ export const transactionService = {
   getById: (id) =>
     api.get(`/transactions/${id}`),
 
-  getMy: () =>
-    api.get('/transactions/my'),
-
   getProviderPending: () =>
     api.get('/transactions/provider/pending'),
 